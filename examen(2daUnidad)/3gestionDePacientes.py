@@ -1,60 +1,460 @@
 import os
+import sys
 import time
+import argparse
+import tracemalloc
+from array import array
+from itertools import compress, repeat
+from persistencia import BitacoraDeEscritura, POLITICAS_FSYNC, medir_politicas_fsync, mostrar_medicion
+from listado import paginar, escribir_filas, escribir_por_paginas
 
-# --- Clase para el Nodo (Paciente) ---
+# Niveles del modo triaje, de mayor a menor prioridad
+NIVELES_DE_PRIORIDAD = ("urgente", "normal")
+
+# --- Clase Paciente (datos que devuelve la cola) ---
 class Paciente:
     """
-    Representa un nodo en la lista enlazada. Contiene los datos
-    del paciente y un puntero al siguiente.
+    Datos de un paciente tal como los devuelve la cola al atenderlo,
+    buscarlo o listarlo. La cola no guarda estos objetos: guarda cada campo
+    en un arreglo compacto y solo crea un Paciente cuando tiene que entregarlo.
     """
-    def __init__(self, nombre, edad, prioridad):
+    __slots__ = ('id', 'nombre', 'edad', 'prioridad', 'llegada')
+
+    def __init__(self, nombre, edad, prioridad, id_paciente=None, llegada=None):
+        self.id = id_paciente
         self.nombre = nombre
         self.edad = edad
         self.prioridad = prioridad
-        self.siguiente = None  # Puntero al siguiente paciente en la lista
+        self.llegada = llegada  # Momento en que se formó (para la promoción por espera)
+
+# --- Carril: una lista doblemente enlazada FIFO (modo triaje) ---
+class Carril:
+    """
+    Lista doblemente enlazada con cabeza y cola: agregar, atender y retirar en O(1).
+    Los punteros son ids de paciente (0 = ninguno); los enlaces viven en los
+    arreglos de la ColaDeEspera.
+    """
+    __slots__ = ('cabeza', 'cola', 'contador')
+
+    def __init__(self):
+        self.cabeza = 0
+        self.cola = 0
+        self.contador = 0
 
 # --- Clase para la Cola de Espera (Lista Enlazada Optimizada) ---
 class ColaDeEspera:
     """
-    Implementa una cola (Queue) con una lista enlazada. Utiliza punteros
+    Implementa una cola (Queue) con listas enlazadas. Utiliza punteros
     a la cabeza y a la cola para operaciones FIFO eficientes.
+
+    En modo 'fifo' hay un solo carril y se atiende por orden de llegada.
+    En modo 'triaje' hay un carril FIFO por nivel de prioridad: se atiende
+    primero a los urgentes, salvo que el primero de un nivel inferior lleve
+    esperando más de 'espera_maxima' segundos (promoción por espera, evita
+    que nunca le toque). Un índice por id y por nombre permite buscar o
+    retirar a cualquier paciente en O(1).
+
+    Almacenamiento: los nodos no son objetos sino posiciones en arreglos
+    paralelos, una por id: la posición de un paciente es 'id - base'. La
+    prioridad se guarda como un código que apunta a una tabla de textos
+    internados. Cada modo guarda solo lo que usa:
+      - 'fifo': nombre, edad y código. Los ids crecen con la llegada, así que
+        el orden de los arreglos ya es el orden de atención: no hay enlaces y
+        atender solo avanza el inicio. El índice por nombre se arma la primera
+        vez que se busca o retira a alguien por nombre.
+      - 'triaje': además la hora de llegada, los enlaces de cada carril y el
+        índice por nombre.
+    Los lugares que quedan libres al principio conservan sus datos hasta que
+    se recortan, al encolar, cuando son más de la mitad (costo amortizado O(1)).
+
+    Si se indica 'ruta_persistencia', cada cambio se anota en una bitácora en
+    disco y la cola se recupera al volver a crearla.
     """
-    def __init__(self):
-        self.cabeza = None  # El frente de la cola (quién será atendido)
-        self.cola = None    # El final de la cola (dónde se forman los nuevos)
+    def __init__(self, ruta_persistencia=None, politica_fsync='lote', modo='fifo', espera_maxima=30 * 60, reloj=time.time):
+        if modo not in ('fifo', 'triaje'):
+            raise ValueError(f"Modo desconocido: {modo}. Use 'fifo' o 'triaje'.")
+        self.modo = modo
+        self._triaje = modo == 'triaje'
+        self.espera_maxima = espera_maxima
+        self.reloj = reloj
+        self.carriles = {nivel: Carril() for nivel in NIVELES_DE_PRIORIDAD} if self._triaje else {}
+        self._carriles = list(self.carriles.values())
         self.contador = 0   # Para saber el tamaño de la cola
+        self.siguiente_id = 1
+        # nombre -> id del primer paciente en llegar con ese nombre (en fifo, None hasta que se necesita)
+        self.por_nombre = {} if self._triaje else None
+        self._fifo_simple = not self._triaje  # fifo sin índice por nombre: atender solo avanza el inicio
+        # Tabla de prioridades: código -> texto internado y código -> carril (0 = lugar libre)
+        self._prioridades = [None]
+        self._carril_por_codigo = [None]
+        self._codigo_por_prioridad = {}
+        self._vaciar_almacen(1)
+        self.bitacora = None
+        if ruta_persistencia:
+            self._recuperar(BitacoraDeEscritura(ruta_persistencia, politica_fsync))
+
+    def _vaciar_almacen(self, base):
+        """Deja los arreglos vacíos; el próximo paciente ocupará la posición 0 con id 'base'."""
+        self._base = base
+        self._inicio = 0   # Las posiciones anteriores están libres
+        self._huecos = 0   # Lugares libres (retirados) desde el inicio en adelante
+        self._recortar_desde = 1024
+        self._nombres = []
+        self._edades = []  # Lista: la edad se guarda tal como llega, sin límite de rango
+        self._codigos = array('H')
+        if self._triaje:
+            self._llegadas = array('d')
+            self._siguientes = array('q')  # Enlaces del carril (ids)
+            self._anteriores = array('q')
+        if self.por_nombre is not None:
+            self._siguientes_mismo_nombre = array('q')  # Anillo de pacientes con el mismo nombre
+            self._anteriores_mismo_nombre = array('q')
+
+    def _arreglos(self):
+        """Los arreglos paralelos que usa este modo (todos del mismo largo)."""
+        arreglos = [self._nombres, self._edades, self._codigos]
+        if self._triaje:
+            arreglos += [self._llegadas, self._siguientes, self._anteriores]
+        if self.por_nombre is not None:
+            arreglos += [self._siguientes_mismo_nombre, self._anteriores_mismo_nombre]
+        return arreglos
+
+    def _posicion(self, id_paciente):
+        """Posición del paciente en los arreglos, o None si no está en la cola."""
+        if id_paciente is None:
+            return None
+        posicion = id_paciente - self._base
+        if self._inicio <= posicion < len(self._codigos) and self._codigos[posicion]:
+            return posicion
+        return None
+
+    def _paciente_en(self, posicion):
+        return Paciente(self._nombres[posicion], self._edades[posicion],
+                        self._prioridades[self._codigos[posicion]], self._base + posicion,
+                        self._llegadas[posicion] if self._triaje else None)
+
+    def _codigo_de(self, prioridad):
+        codigo = self._codigo_por_prioridad.get(prioridad)
+        if codigo is None:
+            carril = self._carriles.index(self._carril_de(prioridad)) if self._triaje else None
+            codigo = len(self._prioridades)
+            self._codigo_por_prioridad[prioridad] = codigo
+            self._prioridades.append(sys.intern(prioridad) if type(prioridad) is str else prioridad)
+            self._carril_por_codigo.append(carril)
+        return codigo
+
+    @property
+    def por_id(self):
+        """Ids de los pacientes en espera (el índice por id es la propia posición en los arreglos)."""
+        codigos, base = self._codigos, self._base
+        return [base + posicion for posicion in range(self._inicio, len(codigos)) if codigos[posicion]]
+
+    @property
+    def cabeza(self):
+        """El próximo paciente según el orden de los carriles (sin contar promociones)."""
+        if not self._triaje:
+            return self._paciente_en(self._inicio) if self.contador else None
+        for carril in self._carriles:
+            if carril.cabeza:
+                return self._paciente_en(carril.cabeza - self._base)
+        return None
+
+    @property
+    def cola(self):
+        """El último paciente del carril de menor prioridad que tenga pacientes."""
+        if not self._triaje:
+            posicion = len(self._codigos) - 1
+            while posicion >= self._inicio and not self._codigos[posicion]:
+                posicion -= 1
+            return self._paciente_en(posicion) if self.contador else None
+        for carril in reversed(self._carriles):
+            if carril.cola:
+                return self._paciente_en(carril.cola - self._base)
+        return None
+
+    def _carril_de(self, prioridad):
+        nivel = str(prioridad).strip().lower()
+        # Una prioridad desconocida se trata como la menos urgente
+        return self.carriles.get(nivel, self.carriles[NIVELES_DE_PRIORIDAD[-1]])
+
+    def _recorrer_ids(self):
+        if not self._triaje:
+            codigos, base = self._codigos, self._base
+            for posicion in range(self._inicio, len(codigos)):
+                if codigos[posicion]:
+                    yield base + posicion
+            return
+        for carril in self._carriles:
+            actual = carril.cabeza
+            while actual:
+                yield actual
+                actual = self._siguientes[actual - self._base]
+
+    def iterar_pacientes(self, desde=0, cantidad=None):
+        """
+        Generador que recorre los pacientes carril por carril, en el orden en que
+        serían atendidos. Con 'desde' y 'cantidad' devuelve solo esa página:
+        cuesta O(desde + cantidad), sin importar cuántos pacientes haya detrás.
+        No se debe modificar la cola mientras se recorre.
+        """
+        for id_paciente in paginar(self._recorrer_ids(), desde, cantidad):
+            yield self._paciente_en(id_paciente - self._base)
+
+    def proximos_pacientes(self, k):
+        """Devuelve los k primeros pacientes de la lista de espera. O(k)."""
+        return list(self.iterar_pacientes(0, k))
+
+    # --- Persistencia (bitácora + snapshots) ---
+    def _registrar(self, operacion):
+        if self.bitacora is None:
+            return
+        self.bitacora.registrar(operacion)
+        if self.bitacora.necesita_snapshot(self.contador):
+            self.bitacora.programar_snapshot(self._copia_para_snapshot())
+
+    def _copia_para_snapshot(self):
+        """
+        Copia los arreglos desde el inicio (rebanadas hechas en C, sin crear un
+        Paciente por fila) y devuelve la función que arma el estado con esa
+        copia; la bitácora la llama en el hilo del snapshot. El estado va por
+        columnas (ids, nombres, edades, prioridades, llegadas).
+        """
+        primer_id, siguiente_id = self._base + self._inicio, self.siguiente_id
+        nombres, edades, codigos = self._nombres[self._inicio:], self._edades[self._inicio:], self._codigos[self._inicio:]
+        llegadas = self._llegadas[self._inicio:] if self._triaje else None
+        prioridades = list(self._prioridades)
+
+        def armar_estado():
+            # Por columnas y con generadores: la bitácora los escribe de a bloques
+            # sin crear un objeto por paciente (que además haría trabajar al recolector)
+            return {"siguiente_id": siguiente_id,
+                    "ids": (primer_id + i for i, codigo in enumerate(codigos) if codigo),
+                    "nombres": compress(nombres, codigos),
+                    "edades": compress(edades, codigos),
+                    "prioridades": (prioridades[codigo] for codigo in codigos if codigo),
+                    "llegadas": compress(llegadas, codigos) if llegadas is not None else None}
+        return armar_estado
 
+    def _recuperar(self, bitacora):
+        """Reconstruye la cola con el último snapshot y las operaciones posteriores."""
+        snapshot, operaciones = bitacora.recuperado()
+        if snapshot is not None:
+            estado = snapshot[1]
+            if "ids" in estado:
+                pacientes = zip(estado["ids"], estado["nombres"], estado["edades"], estado["prioridades"],
+                                estado["llegadas"] or repeat(None))
+            else:
+                # Snapshots por filas; los anteriores al modo triaje: [nombre, edad, prioridad] sin id
+                pacientes = sorted((p if len(p) == 5 else [None, *p, None] for p in estado["pacientes"]),
+                                   key=lambda p: p[0] or 0)
+            for id_paciente, nombre, edad, prioridad, llegada in pacientes:
+                self._encolar(nombre, edad, prioridad, id_paciente, llegada)
+            self.siguiente_id = max(self.siguiente_id, estado.get("siguiente_id", 1))
+        for _, (tipo, *datos) in operaciones:
+            if tipo == "agregar":
+                if len(datos) == 3:
+                    datos = [None, *datos, None]
+                id_paciente, nombre, edad, prioridad, llegada = datos
+                self._encolar(nombre, edad, prioridad, id_paciente, llegada)
+            elif tipo == "retirar":
+                self._quitar(datos[0])
+            elif tipo == "atender":
+                self._desencolar()
+        # Desde aquí los cambios sí se registran
+        self.bitacora = bitacora
+
+    def cerrar_persistencia(self):
+        """Fuerza a disco lo pendiente y cierra la bitácora."""
+        if self.bitacora is not None:
+            self.bitacora.cerrar()
+            self.bitacora = None
+
+    # --- Operaciones ---
     def agregar_paciente(self, nombre, edad, prioridad):
         """
-        Añade un paciente al final de la cola (Enqueue).
-        Gracias al puntero 'self.cola', esta operación es O(1).
+        Añade un paciente al final de su carril (Enqueue).
+        Gracias al puntero a la cola del carril, esta operación es O(1).
         """
-        nuevo_paciente = Paciente(nombre, edad, prioridad)
-        if self.esta_vacia():
-            # Si la cola está vacía, el nuevo paciente es cabeza y cola
-            self.cabeza = nuevo_paciente
-            self.cola = nuevo_paciente
-        else:
-            # El 'siguiente' del actual último apunta al nuevo
-            self.cola.siguiente = nuevo_paciente
-            # El nuevo paciente es ahora la nueva cola
-            self.cola = nuevo_paciente
-        
+        id_paciente = self._encolar(nombre, edad, prioridad)
+        print(f"\n>> INFO: {nombre} (ID {id_paciente}) se ha formado al final de la cola.")
+        return self._paciente_en(id_paciente - self._base)
+
+    def _encolar(self, nombre, edad, prioridad, id_paciente=None, llegada=None):
+        """
+        Enqueue sin imprimir nada; devuelve el id del paciente. O(1) amortizado.
+        Todo lo que puede fallar (prioridad o nombre no válidos como clave, id
+        repetido, llegada que no es un número) se comprueba antes de agregar
+        nada a los arreglos, para que un dato malo no deje la cola a medias.
+        """
+        codigo = self._codigo_de(prioridad)
+        if id_paciente is None:
+            id_paciente = self.siguiente_id
+        if self._triaje:
+            llegada = self.reloj() if llegada is None else float(llegada)
+        primero = self.por_nombre.get(nombre) if self.por_nombre is not None else None
+        if not self.contador:
+            self._vaciar_almacen(id_paciente)
+        elif self._inicio >= self._recortar_desde:
+            self._recortar_inicio()
+        posicion = id_paciente - self._base
+        if posicion != len(self._codigos):
+            self._saltar_ids(id_paciente, posicion)
+
+        self._codigos.append(codigo)
+        self._nombres.append(nombre)
+        self._edades.append(edad)
+        if self._triaje:
+            self._enlazar_en_carril(posicion, id_paciente, codigo, llegada)
+        if self.por_nombre is not None:
+            self._siguientes_mismo_nombre.append(id_paciente)
+            self._anteriores_mismo_nombre.append(id_paciente)
+            self._unir_al_anillo(posicion, id_paciente, nombre, primero)
+        if id_paciente >= self.siguiente_id:
+            self.siguiente_id = id_paciente + 1
         self.contador += 1
-        print(f"\n>> INFO: {nombre} se ha formado al final de la cola.")
+        if self.bitacora is not None:
+            self._registrar(["agregar", id_paciente, nombre, edad, prioridad, llegada])
+        return id_paciente
+
+    def _saltar_ids(self, id_paciente, posicion):
+        """Ids salteados (pacientes que ya no están al recuperar): quedan como lugares libres."""
+        if posicion < len(self._codigos):
+            raise ValueError(f"El id {id_paciente} ya fue usado en esta cola.")
+        huecos = posicion - len(self._codigos)
+        for arreglo in self._arreglos():
+            arreglo.extend([None] * huecos if type(arreglo) is list else [0] * huecos)
+        self._huecos += huecos
+
+    def _enlazar_en_carril(self, posicion, id_paciente, codigo, llegada):
+        self._llegadas.append(llegada)
+        self._siguientes.append(0)
+        self._anteriores.append(0)
+        carril = self._carriles[self._carril_por_codigo[codigo]]
+        if carril.cola:
+            self._siguientes[carril.cola - self._base] = id_paciente
+            self._anteriores[posicion] = carril.cola
+        else:
+            # Si el carril está vacío, el nuevo paciente es cabeza y cola
+            carril.cabeza = id_paciente
+        carril.cola = id_paciente
+        carril.contador += 1
+
+    def _unir_al_anillo(self, posicion, id_paciente, nombre, primero):
+        """Agrega al paciente al final del anillo de su nombre ('primero': id del primero, o None)."""
+        if primero is None:
+            self.por_nombre[nombre] = id_paciente
+            return
+        # Se inserta al final del anillo (justo antes del primero)
+        ultimo = self._anteriores_mismo_nombre[primero - self._base]
+        self._siguientes_mismo_nombre[ultimo - self._base] = id_paciente
+        self._anteriores_mismo_nombre[posicion] = ultimo
+        self._siguientes_mismo_nombre[posicion] = primero
+        self._anteriores_mismo_nombre[primero - self._base] = id_paciente
+
+    def _activar_indice_por_nombre(self):
+        """Arma el índice por nombre de un solo recorrido (en fifo, la primera vez que se necesita). O(n)."""
+        base = self._base
+        self.por_nombre = {}
+        self._fifo_simple = False
+        self._siguientes_mismo_nombre = array('q', range(base, base + len(self._codigos)))
+        self._anteriores_mismo_nombre = array('q', self._siguientes_mismo_nombre)
+        for id_paciente in self._recorrer_ids():
+            nombre = self._nombres[id_paciente - base]
+            self._unir_al_anillo(id_paciente - base, id_paciente, nombre, self.por_nombre.get(nombre))
+
+    def _quitar(self, id_paciente):
+        """Retira a un paciente de su carril y de los índices. O(1) amortizado."""
+        base = self._base
+        posicion = id_paciente - base
+        if self._triaje:
+            carril = self._carriles[self._carril_por_codigo[self._codigos[posicion]]]
+            anterior, siguiente = self._anteriores[posicion], self._siguientes[posicion]
+            if anterior:
+                self._siguientes[anterior - base] = siguiente
+            else:
+                carril.cabeza = siguiente
+            if siguiente:
+                self._anteriores[siguiente - base] = anterior
+            else:
+                carril.cola = anterior
+            carril.contador -= 1
+
+        if self.por_nombre is not None:
+            nombre = self._nombres[posicion]
+            siguiente = self._siguientes_mismo_nombre[posicion]
+            if siguiente == id_paciente:
+                del self.por_nombre[nombre]
+            else:
+                anterior = self._anteriores_mismo_nombre[posicion]
+                self._anteriores_mismo_nombre[siguiente - base] = anterior
+                self._siguientes_mismo_nombre[anterior - base] = siguiente
+                if self.por_nombre[nombre] == id_paciente:
+                    self.por_nombre[nombre] = siguiente
+
+        # El lugar queda libre
+        self._codigos[posicion] = 0
+        self.contador -= 1
+        if posicion == self._inicio:
+            self._inicio += 1
+            self._saltar_huecos()
+        else:
+            self._huecos += 1
+        if self.bitacora is not None:
+            self._registrar(["retirar", id_paciente])
+
+    def _saltar_huecos(self):
+        """Lleva el inicio hasta el primer lugar ocupado (o hasta el final)."""
+        codigos, posicion, fin = self._codigos, self._inicio, len(self._codigos)
+        while self._huecos and posicion < fin and not codigos[posicion]:
+            posicion += 1
+            self._huecos -= 1
+        self._inicio = posicion
+
+    def _recortar_inicio(self):
+        """Descarta los lugares libres del principio cuando son más de la mitad de los arreglos."""
+        libres = self._inicio
+        if 2 * libres < len(self._codigos):
+            self._recortar_desde = max(1024, len(self._codigos) // 2)
+            return
+        for arreglo in self._arreglos():
+            del arreglo[:libres]
+        self._base += libres
+        self._inicio = 0
+
+    def _elegir_siguiente(self):
+        """
+        Decide a quién atender (devuelve su id). En fifo es el del inicio. En
+        triaje, si el primero de algún carril lleva esperando más de
+        'espera_maxima', se atiende al que más espera de ellos; si no, al
+        primero del carril más urgente. O(número de niveles) = O(1).
+        """
+        if not self._triaje:
+            return self._base + self._inicio if self.contador else None
+        cabezas = [c.cabeza for c in self._carriles if c.cabeza]
+        if not cabezas:
+            return None
+        if len(cabezas) > 1:
+            limite = self.reloj() - self.espera_maxima
+            llegadas, base = self._llegadas, self._base
+            vencidos = [i for i in cabezas[1:] if llegadas[i - base] <= limite]
+            if vencidos:
+                return min(vencidos, key=lambda i: llegadas[i - base])
+        return cabezas[0]
 
     def atender_paciente(self):
         """
-        Atiende al paciente del frente de la cola (Dequeue).
-        Gracias al puntero 'self.cabeza', esta operación es O(1).
+        Atiende al siguiente paciente (Dequeue).
+        Solo se miran las cabezas de los carriles, así que esta operación es O(1).
         """
         if self.esta_vacia():
             print("\n>> INFO: No hay pacientes en la cola para atender.")
             return
 
-        # Se obtiene el paciente al frente de la cola
-        paciente_atendido = self.cabeza
-        
+        # Se obtiene el paciente que corresponde atender
+        id_paciente = self._elegir_siguiente()
+        paciente_atendido = self._paciente_en(id_paciente - self._base)
+        self._quitar(id_paciente)
+
         print("\n" + "*"*40)
         print("   ATENDIENDO AL SIGUIENTE PACIENTE...")
         print("*"*40)
@@ -62,63 +462,192 @@ class ColaDeEspera:
         print(f"   Edad:      {paciente_atendido.edad}")
         print(f"   Prioridad: {paciente_atendido.prioridad.capitalize()}")
         print("*"*40)
+        return paciente_atendido
 
-        # Se avanza la cabeza al siguiente en la cola
-        self.cabeza = self.cabeza.siguiente
-        
-        # Si la cabeza es None, la cola quedó vacía
-        if self.cabeza is None:
-            self.cola = None
+    def _desencolar(self):
+        """Dequeue sin imprimir nada; devuelve el id del paciente atendido (o None). O(1) amortizado."""
+        if self._fifo_simple:
+            # Camino corto de fifo: no hay enlaces ni índice que actualizar
+            if not self.contador:
+                return None
+            posicion = self._inicio
+            self._inicio = posicion + 1
+            self.contador -= 1
+            if self._huecos:
+                self._saltar_huecos()
+            id_paciente = self._base + posicion
+            if self.bitacora is not None:
+                self._registrar(["retirar", id_paciente])
+            return id_paciente
+        id_paciente = self._elegir_siguiente()
+        if id_paciente is not None:
+            self._quitar(id_paciente)
+        return id_paciente
 
-        self.contador -= 1
-        return paciente_atendido
+    def _buscar_id(self, nombre=None, id_paciente=None):
+        if id_paciente is not None:
+            return id_paciente if self._posicion(id_paciente) is not None else None
+        if self.por_nombre is None:
+            self._activar_indice_por_nombre()
+        return self.por_nombre.get(nombre)
+
+    def buscar_paciente(self, nombre=None, id_paciente=None):
+        """Devuelve el paciente con ese id, o el primero en llegar con ese nombre. O(1)."""
+        id_paciente = self._buscar_id(nombre, id_paciente)
+        return self._paciente_en(id_paciente - self._base) if id_paciente is not None else None
+
+    def retirar_paciente(self, nombre=None, id_paciente=None):
+        """Saca de la cola a un paciente (por ejemplo, si se fue sin ser atendido). O(1)."""
+        id_paciente = self._buscar_id(nombre, id_paciente)
+        if id_paciente is None:
+            print("\n>> INFO: No se encontró a ese paciente en la cola.")
+            return None
+        paciente = self._paciente_en(id_paciente - self._base)
+        self._quitar(id_paciente)
+        print(f"\n>> INFO: {paciente.nombre} fue retirado de la cola.")
+        return paciente
 
-    def mostrar_lista_actual(self):
+    def mostrar_lista_actual(self, desde=0, cantidad=None, por_paginas=False):
         """
-        Muestra el estado completo de la cola.
-        Es una operación O(n) porque debe recorrer toda la lista.
+        Muestra la cola (o solo la página [desde, desde + cantidad)).
+        Las filas se generan a medida que se escriben y salen en bloques, así
+        que mostrar una página cuesta O(desde + cantidad). Con 'por_paginas'
+        se pregunta antes de mostrar cada página siguiente.
         """
         if self.esta_vacia():
             print("\n>> La cola de espera está vacía.")
             return
 
-        print("\n" + "="*45)
-        print("      COLA DE ESPERA DE PACIENTES (FIFO)")
-        print("="*45)
-        print(f"{'Orden':<7}{'Nombre':<15}{'Edad':<7}{'Prioridad'}")
-        print("-"*45)
-        
-        actual = self.cabeza
-        orden = 1
-        while actual:
-            print(f"{orden:<7}{actual.nombre:<15}{actual.edad:<7}{actual.prioridad.capitalize()}")
-            actual = actual.siguiente
-            orden += 1
-        print("="*45)
-        print(f"Total de pacientes en espera: {self.contador}")
+        print("\n" + "="*51)
+        print(f"      COLA DE ESPERA DE PACIENTES ({self.modo.upper()})")
+        print("="*51)
+        print(f"{'Orden':<7}{'ID':<6}{'Nombre':<15}{'Edad':<7}{'Prioridad'}")
+        print("-"*51)
+
+        filas = (f"{orden:<7}{actual.id:<6}{actual.nombre:<15}{actual.edad:<7}{actual.prioridad.capitalize()}\n"
+                 for orden, actual in enumerate(self.iterar_pacientes(desde, cantidad), start=desde + 1))
+        mostradas = escribir_por_paginas(filas) if por_paginas else escribir_filas(filas)
+        print("="*51)
+        if mostradas == 0:
+            print(f"No hay pacientes a partir de la posición {desde + 1} (total: {self.contador}).")
+        elif mostradas < self.contador:
+            print(f"Mostrando {desde + 1}-{desde + mostradas} de {self.contador} pacientes en espera.")
+        else:
+            print(f"Total de pacientes en espera: {self.contador}")
 
     def esta_vacia(self):
         """Chequea si la cola no tiene pacientes."""
-        return self.cabeza is None
+        return self.contador == 0
+
+# --- Medición de memoria y rendimiento ---
+class _PacienteEnlazado:
+    """Nodo de la implementación original (con __dict__), solo como referencia de comparación."""
+    def __init__(self, nombre, edad, prioridad):
+        self.nombre = nombre
+        self.edad = edad
+        self.prioridad = prioridad
+        self.siguiente = None
+
+class _ColaEnlazadaOriginal:
+    """Lista enlazada FIFO original, sin índices ni carriles."""
+    def __init__(self):
+        self.cabeza = None
+        self.cola = None
+        self.contador = 0
+
+    def _encolar(self, nombre, edad, prioridad):
+        nuevo = _PacienteEnlazado(nombre, edad, prioridad)
+        if self.cabeza is None:
+            self.cabeza = self.cola = nuevo
+        else:
+            self.cola.siguiente = nuevo
+            self.cola = nuevo
+        self.contador += 1
+
+    def _desencolar(self):
+        atendido = self.cabeza
+        self.cabeza = atendido.siguiente
+        if self.cabeza is None:
+            self.cola = None
+        self.contador -= 1
+        return atendido
+
+def medir_memoria_y_rendimiento(n=1_000_000, repeticiones=3):
+    """
+    Compara la lista enlazada original con ColaDeEspera (fifo y triaje) con n pacientes:
+    bytes por paciente en espera (tracemalloc) y operaciones/seg al encolar y atender
+    (la mejor de 'repeticiones' pasadas, igual para todas las variantes).
+    """
+    nombres = [f"Paciente {i}" for i in range(n)]  # Se crean antes para medir solo la estructura
+    prioridades = ("normal", "urgente")
+    variantes = {
+        "lista original": _ColaEnlazadaOriginal,
+        "fifo (arreglos)": lambda: ColaDeEspera(modo='fifo'),
+        "triaje (arreglos)": lambda: ColaDeEspera(modo='triaje'),
+    }
+    resultados = {}
+    for nombre_variante, crear in variantes.items():
+        tracemalloc.start()
+        cola = crear()
+        base = tracemalloc.get_traced_memory()[0]
+        for i in range(n):
+            cola._encolar(nombres[i], i % 90, prioridades[i % 7 == 0])
+        memoria = tracemalloc.get_traced_memory()[0] - base
+        tracemalloc.stop()
+        del cola
+
+        encolar = atender = float('inf')
+        for _ in range(repeticiones):
+            cola = crear()
+            inicio = time.perf_counter()
+            for i in range(n):
+                cola._encolar(nombres[i], i % 90, prioridades[i % 7 == 0])
+            encolar = min(encolar, time.perf_counter() - inicio)
+            inicio = time.perf_counter()
+            for _ in range(n):
+                cola._desencolar()
+            atender = min(atender, time.perf_counter() - inicio)
+            del cola
+
+        resultados[nombre_variante] = {
+            "bytes_por_paciente": round(memoria / n, 1),
+            "encolar_por_segundo": round(n / encolar),
+            "atender_por_segundo": round(n / atender),
+        }
+    return resultados
+
+def mostrar_medicion_memoria(resultados, n):
+    print("\n" + "="*66)
+    print(f"  MEMORIA Y RENDIMIENTO CON {n} PACIENTES")
+    print("="*66)
+    print(f"{'Variante':<18}{'bytes/paciente':>16}{'encolar/seg':>16}{'atender/seg':>16}")
+    print("-"*66)
+    for variante, medicion in resultados.items():
+        print(f"{variante:<18}{medicion['bytes_por_paciente']:>16}{medicion['encolar_por_segundo']:>16}{medicion['atender_por_segundo']:>16}")
+    print("="*66)
 
 # --- Interfaz de Consola ---
-def main():
-    sistema = ColaDeEspera()
-    
-    # Datos de ejemplo para iniciar
-    print("Cargando sistema con pacientes iniciales...")
-    sistema.agregar_paciente("Ana Lopez", 45, "normal")
-    sistema.agregar_paciente("Carlos Vera", 67, "urgente")
-    sistema.agregar_paciente("Sofia Marin", 22, "normal")
+def main(ruta_persistencia=None, politica_fsync='lote', modo='fifo'):
+    sistema = ColaDeEspera(ruta_persistencia, politica_fsync, modo)
+
+    if ruta_persistencia and (sistema.bitacora.secuencia or not sistema.esta_vacia()):
+        print(f"Se recuperaron {sistema.contador} pacientes en espera desde '{ruta_persistencia}'.")
+    else:
+        # Datos de ejemplo para iniciar
+        print("Cargando sistema con pacientes iniciales...")
+        sistema.agregar_paciente("Ana Lopez", 45, "normal")
+        sistema.agregar_paciente("Carlos Vera", 67, "urgente")
+        sistema.agregar_paciente("Sofia Marin", 22, "normal")
     time.sleep(1)
 
     while True:
         os.system('cls' if os.name == 'nt' else 'clear')
-        print("\n🏥 === Sistema de Cola de Pacientes (FIFO) ===")
+        print(f"\n🏥 === Sistema de Cola de Pacientes ({sistema.modo.upper()}) ===")
         print("1. Agregar paciente a la cola")
         print("2. Atender siguiente paciente")
         print("3. Mostrar cola de espera actual")
-        print("4. Salir")
+        print("4. Retirar a un paciente de la cola")
+        print("5. Salir")
         
         opcion = input("Seleccione una opción: ")
 
@@ -132,10 +661,15 @@ def main():
             sistema.atender_paciente()
 
         elif opcion == '3':
-            sistema.mostrar_lista_actual()
+            sistema.mostrar_lista_actual(por_paginas=True)
 
         elif opcion == '4':
+            nombre = input("Ingrese nombre del paciente a retirar: ")
+            sistema.retirar_paciente(nombre)
+
+        elif opcion == '5':
             print("\nSaliendo del sistema... ¡Hasta luego!")
+            sistema.cerrar_persistencia()
             break
         
         else:
@@ -144,4 +678,20 @@ def main():
         input("\nPresione Enter para continuar...")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Sistema de cola de pacientes")
+    parser.add_argument("--persistir", metavar="CARPETA", help="guarda la cola en disco y la recupera al iniciar")
+    parser.add_argument("--fsync", choices=POLITICAS_FSYNC, default='lote', help="política de fsync de la bitácora")
+    parser.add_argument("--medir-persistencia", action="store_true", help="mide ops/seg con cada política de fsync")
+    parser.add_argument("--triaje", action="store_true", help="atiende primero a los urgentes (con promoción por espera)")
+    parser.add_argument("--medir-memoria", type=int, nargs='?', const=1_000_000, metavar="N",
+                        help="compara memoria y rendimiento con la lista enlazada original (N pacientes)")
+    args = parser.parse_args()
+
+    if args.medir_memoria:
+        mostrar_medicion_memoria(medir_memoria_y_rendimiento(args.medir_memoria), args.medir_memoria)
+    elif args.medir_persistencia:
+        mostrar_medicion("ColaDeEspera: agregar y atender", medir_politicas_fsync(
+            lambda carpeta, politica: ColaDeEspera(carpeta, politica or 'lote'),
+            lambda cola, i: cola._encolar(f"Paciente {i}", 30, "normal") if i % 3 or cola.esta_vacia() else cola._desencolar()))
+    else:
+        main(args.persistir, args.fsync, 'triaje' if args.triaje else 'fifo')
\ No newline at end of file
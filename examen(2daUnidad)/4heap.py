@@ -1,51 +1,218 @@
 import heapq
 import os
 import time
+import random
+import asyncio
+import argparse
+import threading
+from collections import deque
+from itertools import islice
+from persistencia import BitacoraDeEscritura, POLITICAS_FSYNC, medir_politicas_fsync, mostrar_medicion
+from listado import paginar, escribir_filas, escribir_por_paginas
+
+# --- Recorrido ordenado de un heap (sin modificarlo) ---
+def _recorrer_heap_en_orden(heap):
+    """
+    Generador que recorre un heap de (-prioridad, id, descripcion) de mayor a menor
+    prioridad sin modificarlo. Usa un heap auxiliar con las "fronteras" del
+    recorrido: obtener las primeras k tareas cuesta O(k log k).
+    """
+    if not heap:
+        return
+    frontera = [(heap[0], 0)]
+    while frontera:
+        tarea, indice = heapq.heappop(frontera)
+        prioridad_neg, id_tarea, descripcion = tarea
+        yield id_tarea, descripcion, -prioridad_neg
+        for hijo in (2 * indice + 1, 2 * indice + 2):
+            if hijo < len(heap):
+                heapq.heappush(frontera, (heap[hijo], hijo))
 
 # --- Clase para el Gestor de Tareas (usando un Heap) ---
 class GestorDeTareas:
     """
-    Gestiona una cola de prioridad de tareas usando un montículo (heap).
+    Gestiona una cola de prioridad de tareas usando un montículo (heap) indexado.
     Las tareas con mayor prioridad numérica (10) son atendidas primero.
+    Además del heap se guarda la posición de cada tarea (id -> índice), lo que
+    permite cambiar la prioridad o cancelar una tarea en O(log n).
+    Si se indica 'ruta_persistencia', cada cambio se anota en una bitácora en
+    disco y las tareas se recuperan al volver a crear el gestor.
     """
-    def __init__(self):
+    def __init__(self, ruta_persistencia=None, politica_fsync='lote'):
         # El heap se implementa como una lista simple en Python.
         # Guardaremos tuplas: (-prioridad, id_tarea, descripcion)
         self.tareas_heap = []
+        self.posiciones = {}  # id_tarea -> índice de la tarea dentro del heap
         self.contador_id = 0 # Para que cada tarea sea única
+        self.bitacora = None
+        if ruta_persistencia:
+            self._recuperar(BitacoraDeEscritura(ruta_persistencia, politica_fsync))
+
+    # --- Persistencia (bitácora + snapshots) ---
+    def _registrar(self, operacion):
+        if self.bitacora is None:
+            return
+        self.bitacora.registrar(operacion)
+        if self.bitacora.necesita_snapshot(len(self.tareas_heap)):
+            # Copia barata (las tuplas no cambian); el snapshot se escribe en otro hilo
+            estado = {"contador_id": self.contador_id, "tareas": list(self.tareas_heap)}
+            self.bitacora.programar_snapshot(lambda: estado)
+
+    def _recuperar(self, bitacora):
+        """Reconstruye el heap con el último snapshot y las operaciones posteriores."""
+        snapshot, operaciones = bitacora.recuperado()
+        if snapshot is not None:
+            estado = snapshot[1]
+            self.contador_id = estado["contador_id"]
+            self._cargar_validadas([(-p, i, d) for p, i, d in estado["tareas"]], reordenar_ids=False)
+        for _, (tipo, *datos) in operaciones:
+            if tipo == "agregar":
+                id_tarea, prioridad, descripcion = datos
+                self.contador_id = id_tarea - 1
+                self._insertar(descripcion, prioridad)
+            elif tipo == "cargar":
+                self._cargar_validadas([(p, i, d) for i, p, d in datos[0]], reordenar_ids=False)
+                self.contador_id = max([self.contador_id] + [i for i, _, _ in datos[0]])
+            elif tipo == "quitar":
+                self._quitar_en(self.posiciones[datos[0]])
+            elif tipo == "cambiar":
+                self._reubicar(datos[0], datos[1])
+        # Desde aquí los cambios sí se registran
+        self.bitacora = bitacora
+
+    def cerrar_persistencia(self):
+        """Fuerza a disco lo pendiente y cierra la bitácora."""
+        if self.bitacora is not None:
+            self.bitacora.cerrar()
+            self.bitacora = None
+
+    # --- Operaciones internas del heap indexado ---
+    def _mover(self, indice, tarea):
+        self.tareas_heap[indice] = tarea
+        self.posiciones[tarea[1]] = indice
+
+    def _subir(self, indice):
+        """Sube la tarea mientras tenga más prioridad que su padre. O(log n)."""
+        heap = self.tareas_heap
+        tarea = heap[indice]
+        while indice > 0:
+            padre = (indice - 1) // 2
+            if heap[padre] <= tarea:
+                break
+            self._mover(indice, heap[padre])
+            indice = padre
+        self._mover(indice, tarea)
+
+    def _bajar(self, indice):
+        """Baja la tarea mientras algún hijo tenga más prioridad. O(log n)."""
+        heap = self.tareas_heap
+        n = len(heap)
+        tarea = heap[indice]
+        while True:
+            hijo = 2 * indice + 1
+            if hijo >= n:
+                break
+            if hijo + 1 < n and heap[hijo + 1] < heap[hijo]:
+                hijo += 1
+            if tarea <= heap[hijo]:
+                break
+            self._mover(indice, heap[hijo])
+            indice = hijo
+        self._mover(indice, tarea)
+
+    def _quitar_en(self, indice):
+        """Quita la tarea del índice dado reemplazándola con la última. O(log n)."""
+        heap = self.tareas_heap
+        tarea = heap[indice]
+        del self.posiciones[tarea[1]]
+        ultima = heap.pop()
+        if indice < len(heap):
+            self._mover(indice, ultima)
+            self._subir(indice)
+            self._bajar(self.posiciones[ultima[1]])
+        self._registrar(["quitar", tarea[1]])
+        return tarea
+
+    @staticmethod
+    def _prioridad_valida(prioridad):
+        if not 1 <= prioridad <= 10:
+            print("\n❌ ERROR: La prioridad debe estar entre 1 y 10.")
+            return False
+        return True
 
+    # --- Operaciones públicas ---
     def agregar_tarea(self, descripcion, prioridad):
         """
-        Agrega una nueva tarea al montículo (heap).
-        La operación heappush tiene una complejidad de O(log n).
+        Agrega una nueva tarea al montículo (heap) y devuelve su id.
+        La operación tiene una complejidad de O(log n).
         """
-        if not 1 <= prioridad <= 10:
-            print("\n❌ ERROR: La prioridad debe estar entre 1 y 10.")
-            return
+        if not self._prioridad_valida(prioridad):
+            return None
+
+        id_tarea = self._insertar(descripcion, prioridad)
+        print(f"\n✅ Tarea '{descripcion}' (ID {id_tarea}) con prioridad {prioridad} ha sido añadida.")
+        return id_tarea
 
+    def _insertar(self, descripcion, prioridad):
+        """Inserta sin validar ni imprimir; devuelve el id asignado."""
         # Truco para simular un Max-Heap: usar prioridad negativa.
         # El contador_id ayuda a desempatar si dos tareas tienen la misma prioridad.
-        prioridad_negativa = -prioridad
         self.contador_id += 1
-        tarea = (prioridad_negativa, self.contador_id, descripcion)
-        
-        heapq.heappush(self.tareas_heap, tarea)
-        print(f"\n✅ Tarea '{descripcion}' con prioridad {prioridad} ha sido añadida.")
+        tarea = (-prioridad, self.contador_id, descripcion)
+        self.tareas_heap.append(tarea)
+        self._subir(len(self.tareas_heap) - 1)
+        self._registrar(["agregar", self.contador_id, prioridad, descripcion])
+        return self.contador_id
+
+    def cargar_tareas(self, tareas):
+        """
+        Carga muchas tareas (descripcion, prioridad) de una sola vez.
+        Se agregan al final y se reordena todo con heapify: O(n) en lugar de n inserciones O(log n).
+        """
+        validas = []
+        for descripcion, prioridad in tareas:
+            if not 1 <= prioridad <= 10:
+                print(f"\n❌ ERROR: La tarea '{descripcion}' tiene una prioridad fuera de 1-10 y no se cargó.")
+                continue
+            validas.append((prioridad, None, descripcion))
+
+        ids = self._cargar_validadas(validas)
+        print(f"\n✅ Se cargaron {len(ids)} tareas.")
+        return ids
+
+    def _cargar_validadas(self, tareas, reordenar_ids=True):
+        """
+        Agrega (prioridad, id, descripcion) al final del heap y lo reordena con heapify.
+        Con reordenar_ids=True se asignan ids nuevos (el id recibido se ignora).
+        """
+        nuevas = []
+        for prioridad, id_tarea, descripcion in tareas:
+            if reordenar_ids:
+                self.contador_id += 1
+                id_tarea = self.contador_id
+            nuevas.append((-prioridad, id_tarea, descripcion))
+
+        self.tareas_heap.extend(nuevas)
+        heapq.heapify(self.tareas_heap)
+        self.posiciones = {tarea[1]: indice for indice, tarea in enumerate(self.tareas_heap)}
+        if nuevas:
+            self._registrar(["cargar", [[i, -p, d] for p, i, d in nuevas]])
+        return [tarea[1] for tarea in nuevas]
 
     def atender_siguiente_tarea(self):
         """
         Extrae y procesa la tarea con la más alta prioridad.
-        La operación heappop tiene una complejidad de O(log n).
+        La operación tiene una complejidad de O(log n).
         """
         if not self.tareas_heap:
             print("\n👍 ¡Felicidades! No hay tareas pendientes.")
             return None
 
-        # heappop siempre extrae el elemento más pequeño (en nuestro caso, la prioridad más negativa)
-        prioridad_neg, _, descripcion = heapq.heappop(self.tareas_heap)
-        
+        # La raíz siempre es el elemento más pequeño (en nuestro caso, la prioridad más negativa)
+        prioridad_neg, _, descripcion = self._quitar_en(0)
+
         prioridad_real = -prioridad_neg # Convertir de nuevo a positivo
-        
+
         print("\n" + "*"*45)
         print("  ⚙️  ATENDIENDO LA TAREA MÁS URGENTE...")
         print("*"*45)
@@ -54,6 +221,44 @@ class GestorDeTareas:
         print("*"*45)
         return descripcion
 
+    def cambiar_prioridad(self, id_tarea, nueva_prioridad):
+        """
+        Cambia la prioridad de una tarea pendiente (aumentarla o disminuirla).
+        Gracias al índice de posiciones no hay que buscarla: O(log n).
+        """
+        if id_tarea not in self.posiciones:
+            print(f"\n❌ ERROR: No existe una tarea pendiente con ID {id_tarea}.")
+            return False
+        if not self._prioridad_valida(nueva_prioridad):
+            return False
+
+        descripcion = self._reubicar(id_tarea, nueva_prioridad)
+        print(f"\n🔁 La tarea '{descripcion}' ahora tiene prioridad {nueva_prioridad}.")
+        return True
+
+    def _reubicar(self, id_tarea, nueva_prioridad):
+        """Cambia la prioridad de una tarea existente y restaura el heap."""
+        indice = self.posiciones[id_tarea]
+        _, _, descripcion = self.tareas_heap[indice]
+        self.tareas_heap[indice] = (-nueva_prioridad, id_tarea, descripcion)
+        self._subir(indice)
+        self._bajar(self.posiciones[id_tarea])
+        self._registrar(["cambiar", id_tarea, nueva_prioridad])
+        return descripcion
+
+    def cancelar_tarea(self, id_tarea):
+        """
+        Elimina una tarea pendiente sin atenderla.
+        Gracias al índice de posiciones no hay que buscarla: O(log n).
+        """
+        if id_tarea not in self.posiciones:
+            print(f"\n❌ ERROR: No existe una tarea pendiente con ID {id_tarea}.")
+            return None
+
+        _, _, descripcion = self._quitar_en(self.posiciones[id_tarea])
+        print(f"\n🗑️  La tarea '{descripcion}' fue cancelada.")
+        return descripcion
+
     def ver_siguiente_tarea(self):
         """
         Muestra la tarea de mayor prioridad sin eliminarla (peek).
@@ -73,10 +278,26 @@ class GestorDeTareas:
         print(f"   Prioridad:   {prioridad_real}")
         print("-"*45)
 
-    def mostrar_todas_las_tareas(self):
+    def iterar_en_orden(self, desde=0, cantidad=None):
+        """
+        Generador que recorre las tareas de mayor a menor prioridad sin modificar el heap.
+        Con 'desde' y 'cantidad' devuelve solo esa página: cuesta
+        O((desde + cantidad) log(desde + cantidad)), sin ordenar toda la lista.
+        No se debe modificar el gestor mientras se recorre.
+        """
+        return paginar(_recorrer_heap_en_orden(self.tareas_heap), desde, cantidad)
+
+    def tareas_principales(self, k):
+        """Devuelve las k tareas más prioritarias como (id, descripcion, prioridad)."""
+        return list(islice(_recorrer_heap_en_orden(self.tareas_heap), k))
+
+    def mostrar_todas_las_tareas(self, desde=0, cantidad=None, por_paginas=False):
         """
-        Muestra todas las tareas ordenadas por prioridad.
-        Esta es una operación O(n log n) porque ordena una copia de la lista.
+        Muestra las tareas ordenadas por prioridad (o solo la página [desde, desde + cantidad)).
+        Las tareas se obtienen de forma perezosa con iterar_en_orden() y las
+        filas salen en bloques, así que la primera página aparece enseguida
+        aunque haya millones de tareas. Con 'por_paginas' se pregunta antes de
+        mostrar cada página siguiente.
         """
         if not self.tareas_heap:
             print("\n👍 No hay tareas pendientes.")
@@ -85,26 +306,269 @@ class GestorDeTareas:
         print("\n" + "="*50)
         print("        LISTA COMPLETA DE TAREAS PENDIENTES")
         print("="*50)
-        print(f"{'Prioridad':<12}{'Descripción'}")
+        print(f"{'ID':<6}{'Prioridad':<12}{'Descripción'}")
         print("-"*50)
-        
+
         # Mostramos las tareas ordenadas sin destruir el heap original
-        # sorted() es eficiente para esto.
-        for prioridad_neg, _, descripcion in sorted(self.tareas_heap):
-            prioridad_real = -prioridad_neg
-            print(f"{prioridad_real:<12}{descripcion}")
+        filas = (f"{id_tarea:<6}{prioridad_real:<12}{descripcion}\n"
+                 for id_tarea, descripcion, prioridad_real in self.iterar_en_orden(desde, cantidad))
+        mostradas = escribir_por_paginas(filas) if por_paginas else escribir_filas(filas)
+        total = len(self)
         print("="*50)
-        print(f"Total de tareas pendientes: {len(self.tareas_heap)}")
+        if mostradas == 0:
+            print(f"No hay tareas a partir de la posición {desde + 1} (total: {total}).")
+        elif mostradas < total:
+            print(f"Mostrando {desde + 1}-{desde + mostradas} de {total} tareas pendientes.")
+        else:
+            print(f"Total de tareas pendientes: {total}")
+
+    def __len__(self):
+        return len(self.tareas_heap)
+
+# --- Variante concurrente (varios productores y consumidores) ---
+class GestorDeTareasConcurrente(GestorDeTareas):
+    """
+    Versión segura para hilos del gestor. Todas las operaciones usan un único
+    candado con secciones críticas cortas (sin imprimir nada dentro) y existen
+    versiones por lotes que toman el candado una sola vez para muchas tareas.
+    Los consumidores pueden bloquearse esperando tareas, con o sin límite de
+    tiempo, y también hay una interfaz para asyncio.
+    """
+    def __init__(self, ruta_persistencia=None, politica_fsync='lote'):
+        super().__init__(ruta_persistencia, politica_fsync)
+        self._condicion = threading.Condition()
+        self._esperas_async = deque()  # (loop, future) de corrutinas esperando tareas
+        self.cerrado = False
+
+    def _despertar_async(self, cantidad):
+        """Despierta hasta 'cantidad' corrutinas en espera (se llama con el candado tomado)."""
+        while cantidad > 0 and self._esperas_async:
+            loop, futuro = self._esperas_async.popleft()
+            loop.call_soon_threadsafe(lambda f=futuro: f.done() or f.set_result(None))
+            cantidad -= 1
+
+    def _extraer(self):
+        prioridad_neg, id_tarea, descripcion = self._quitar_en(0)
+        return id_tarea, descripcion, -prioridad_neg
+
+    # --- Productores ---
+    def agregar_tarea(self, descripcion, prioridad):
+        """Agrega una tarea y despierta a un consumidor. Devuelve el id o None si la prioridad no es válida."""
+        if not 1 <= prioridad <= 10:
+            return None
+        with self._condicion:
+            id_tarea = self._insertar(descripcion, prioridad)
+            self._condicion.notify()
+            self._despertar_async(1)
+        return id_tarea
+
+    def agregar_tareas(self, tareas):
+        """
+        Agrega un lote de (descripcion, prioridad) tomando el candado una sola vez.
+        Si el lote es grande comparado con el heap se usa heapify (O(n + k)).
+        """
+        validas = [(d, p) for d, p in tareas if 1 <= p <= 10]
+        with self._condicion:
+            if len(validas) > len(self.tareas_heap):
+                ids = self._cargar_validadas([(p, None, d) for d, p in validas])
+            else:
+                ids = [self._insertar(d, p) for d, p in validas]
+            self._condicion.notify(len(ids))
+            self._despertar_async(len(ids))
+        return ids
+
+    cargar_tareas = agregar_tareas
+
+    # --- Consumidores ---
+    def atender_siguiente_tarea(self, bloquear=True, timeout=None):
+        """
+        Extrae la tarea más prioritaria como (id, descripcion, prioridad).
+        Si no hay tareas y bloquear=True espera hasta que llegue una, hasta que
+        pase 'timeout' segundos o hasta que se cierre el gestor; en esos casos devuelve None.
+        """
+        with self._condicion:
+            if bloquear:
+                self._condicion.wait_for(lambda: self.tareas_heap or self.cerrado, timeout)
+            if not self.tareas_heap:
+                return None
+            return self._extraer()
+
+    def atender_lote(self, maximo, bloquear=True, timeout=None):
+        """Extrae hasta 'maximo' tareas con una sola toma del candado."""
+        with self._condicion:
+            if bloquear:
+                self._condicion.wait_for(lambda: self.tareas_heap or self.cerrado, timeout)
+            return [self._extraer() for _ in range(min(maximo, len(self.tareas_heap)))]
+
+    def cambiar_prioridad(self, id_tarea, nueva_prioridad):
+        with self._condicion:
+            if id_tarea not in self.posiciones or not 1 <= nueva_prioridad <= 10:
+                return False
+            self._reubicar(id_tarea, nueva_prioridad)
+            return True
+
+    def cancelar_tarea(self, id_tarea):
+        with self._condicion:
+            if id_tarea not in self.posiciones:
+                return None
+            return self._quitar_en(self.posiciones[id_tarea])[2]
+
+    def ver_siguiente_tarea(self):
+        with self._condicion:
+            if not self.tareas_heap:
+                return None
+            prioridad_neg, id_tarea, descripcion = self.tareas_heap[0]
+            return id_tarea, descripcion, -prioridad_neg
+
+    def tareas_principales(self, k):
+        with self._condicion:
+            return super().tareas_principales(k)
+
+    def iterar_en_orden(self, desde=0, cantidad=None):
+        """
+        Recorre una copia del heap tomada con el candado: el listado (que puede
+        quedar esperando al usuario entre páginas) no bloquea a productores ni
+        consumidores, y lo que se muestra es una foto consistente.
+        """
+        with self._condicion:
+            heap = list(self.tareas_heap)
+        return paginar(_recorrer_heap_en_orden(heap), desde, cantidad)
+
+    def cerrar_persistencia(self):
+        with self._condicion:
+            super().cerrar_persistencia()
+
+    def cerrar(self):
+        """Indica que no llegarán más tareas: los consumidores en espera terminan al vaciarse la cola."""
+        with self._condicion:
+            self.cerrado = True
+            self._condicion.notify_all()
+            self._despertar_async(len(self._esperas_async))
+
+    def __len__(self):
+        with self._condicion:
+            return len(self.tareas_heap)
+
+    # --- Interfaz asyncio ---
+    async def agregar_tarea_async(self, descripcion, prioridad):
+        return self.agregar_tarea(descripcion, prioridad)
+
+    async def atender_siguiente_tarea_async(self, timeout=None):
+        """
+        Versión 'await' de atender_siguiente_tarea: la corrutina espera sin
+        bloquear el event loop ni ocupar un hilo. Devuelve None al vencer el timeout.
+        """
+        loop = asyncio.get_running_loop()
+        limite = None if timeout is None else loop.time() + timeout
+        while True:
+            with self._condicion:
+                if self.tareas_heap:
+                    return self._extraer()
+                if self.cerrado:
+                    return None
+                futuro = loop.create_future()
+                self._esperas_async.append((loop, futuro))
+            restante = None if limite is None else limite - loop.time()
+            try:
+                await asyncio.wait_for(futuro, restante)
+            except asyncio.TimeoutError:
+                with self._condicion:
+                    if (loop, futuro) in self._esperas_async:
+                        self._esperas_async.remove((loop, futuro))
+                    if self.tareas_heap:
+                        return self._extraer()
+                return None
+
+# --- Prueba de estrés ---
+def _percentil(valores_ordenados, p):
+    if not valores_ordenados:
+        return 0.0
+    indice = min(len(valores_ordenados) - 1, int(round(p / 100 * (len(valores_ordenados) - 1))))
+    return valores_ordenados[indice]
+
+def prueba_de_estres(productores=4, consumidores=4, tareas_por_productor=50_000, lote=1):
+    """
+    Mide el rendimiento de GestorDeTareasConcurrente con varios hilos productores
+    y consumidores. Cada tarea lleva la hora en que se encoló, así cada consumidor
+    mide su latencia (tiempo en cola). Devuelve tareas/seg y percentiles en ms.
+    """
+    gestor = GestorDeTareasConcurrente()
+    latencias = [[] for _ in range(consumidores)]
+
+    def producir(semilla):
+        azar = random.Random(semilla)
+        for inicio in range(0, tareas_por_productor, lote):
+            cantidad = min(lote, tareas_por_productor - inicio)
+            if lote == 1:
+                gestor.agregar_tarea(time.perf_counter(), azar.randint(1, 10))
+            else:
+                ahora = time.perf_counter()
+                gestor.agregar_tareas([(ahora, azar.randint(1, 10)) for _ in range(cantidad)])
+
+    def consumir(numero):
+        propias = latencias[numero]
+        while True:
+            if lote == 1:
+                tarea = gestor.atender_siguiente_tarea()
+                tareas = [tarea] if tarea else []
+            else:
+                tareas = gestor.atender_lote(lote)
+            if not tareas:
+                return  # Gestor cerrado y vacío
+            ahora = time.perf_counter()
+            propias.extend(ahora - encolada for _, encolada, _ in tareas)
+
+    hilos_productores = [threading.Thread(target=producir, args=(i,)) for i in range(productores)]
+    hilos_consumidores = [threading.Thread(target=consumir, args=(i,)) for i in range(consumidores)]
+    inicio = time.perf_counter()
+    for hilo in hilos_consumidores + hilos_productores:
+        hilo.start()
+    for hilo in hilos_productores:
+        hilo.join()
+    gestor.cerrar()
+    for hilo in hilos_consumidores:
+        hilo.join()
+    duracion = time.perf_counter() - inicio
+
+    todas = sorted(latencia for propias in latencias for latencia in propias)
+    total = productores * tareas_por_productor
+    return {
+        "productores": productores,
+        "consumidores": consumidores,
+        "lote": lote,
+        "tareas": total,
+        "atendidas": len(todas),
+        "segundos": round(duracion, 3),
+        "tareas_por_segundo": round(total / duracion) if duracion else 0,
+        "latencia_ms": {f"p{p}": round(_percentil(todas, p) * 1000, 3) for p in (50, 95, 99)},
+    }
+
+def mostrar_prueba_de_estres(resultado):
+    print("\n" + "="*50)
+    print("      PRUEBA DE ESTRÉS - GESTOR CONCURRENTE")
+    print("="*50)
+    print(f"Productores/Consumidores: {resultado['productores']}/{resultado['consumidores']} (lote de {resultado['lote']})")
+    print(f"Tareas atendidas:         {resultado['atendidas']} de {resultado['tareas']}")
+    print(f"Duración:                 {resultado['segundos']} s")
+    print(f"Rendimiento:              {resultado['tareas_por_segundo']} tareas/seg")
+    latencia = resultado['latencia_ms']
+    print(f"Latencia p50/p95/p99:     {latencia['p50']} / {latencia['p95']} / {latencia['p99']} ms")
+    print("="*50)
 
 # --- Interfaz de Consola ---
-def main():
-    sistema = GestorDeTareas()
-    
-    print("Cargando sistema con tareas de ejemplo...")
-    sistema.agregar_tarea("Revisar servidor de base de datos", 9)
-    sistema.agregar_tarea("Enviar reporte semanal", 5)
-    sistema.agregar_tarea("Arreglar bug crítico en producción", 10)
-    sistema.agregar_tarea("Planificar reunión de equipo", 3)
+def main(ruta_persistencia=None, politica_fsync='lote'):
+    sistema = GestorDeTareas(ruta_persistencia, politica_fsync)
+
+    if sistema.contador_id:
+        print(f"Se recuperaron {len(sistema)} tareas pendientes desde '{ruta_persistencia}'.")
+    else:
+        print("Cargando sistema con tareas de ejemplo...")
+        sistema.cargar_tareas([
+            ("Revisar servidor de base de datos", 9),
+            ("Enviar reporte semanal", 5),
+            ("Arreglar bug crítico en producción", 10),
+            ("Planificar reunión de equipo", 3),
+        ])
     time.sleep(1)
 
     while True:
@@ -114,7 +578,9 @@ def main():
         print("2. Atender la tarea más urgente")
         print("3. Ver cuál es la próxima tarea")
         print("4. Mostrar todas las tareas pendientes")
-        print("5. Salir")
+        print("5. Cambiar la prioridad de una tarea")
+        print("6. Cancelar una tarea")
+        print("7. Salir")
         
         opcion = input("Seleccione una opción: ")
 
@@ -133,10 +599,25 @@ def main():
             sistema.ver_siguiente_tarea()
             
         elif opcion == '4':
-            sistema.mostrar_todas_las_tareas()
+            sistema.mostrar_todas_las_tareas(por_paginas=True)
 
         elif opcion == '5':
+            try:
+                id_tarea = int(input("ID de la tarea: "))
+                prio = int(input("Nueva prioridad (1-10): "))
+                sistema.cambiar_prioridad(id_tarea, prio)
+            except ValueError:
+                print("\n❌ ERROR: El ID y la prioridad deben ser números.")
+
+        elif opcion == '6':
+            try:
+                sistema.cancelar_tarea(int(input("ID de la tarea a cancelar: ")))
+            except ValueError:
+                print("\n❌ ERROR: El ID debe ser un número.")
+
+        elif opcion == '7':
             print("\nSaliendo del sistema...")
+            sistema.cerrar_persistencia()
             break
         
         else:
@@ -145,4 +626,22 @@ def main():
         input("\nPresione Enter para continuar...")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Gestor de tareas con heap")
+    parser.add_argument("--persistir", metavar="CARPETA", help="guarda las tareas en disco y las recupera al iniciar")
+    parser.add_argument("--fsync", choices=POLITICAS_FSYNC, default='lote', help="política de fsync de la bitácora")
+    parser.add_argument("--medir-persistencia", action="store_true", help="mide ops/seg con cada política de fsync")
+    parser.add_argument("--estres", action="store_true", help="ejecuta la prueba de estrés concurrente")
+    parser.add_argument("--productores", type=int, default=4)
+    parser.add_argument("--consumidores", type=int, default=4)
+    parser.add_argument("--tareas", type=int, default=50_000, help="tareas por productor")
+    parser.add_argument("--lote", type=int, default=1, help="tamaño de lote para agregar y atender")
+    args = parser.parse_args()
+
+    if args.estres:
+        mostrar_prueba_de_estres(prueba_de_estres(args.productores, args.consumidores, args.tareas, args.lote))
+    elif args.medir_persistencia:
+        mostrar_medicion("GestorDeTareas: agregar y atender", medir_politicas_fsync(
+            lambda carpeta, politica: GestorDeTareasConcurrente(carpeta, politica or 'lote'),
+            lambda gestor, i: gestor.agregar_tarea(f"Tarea {i}", i % 10 + 1) if i % 3 else gestor.atender_siguiente_tarea(bloquear=False)))
+    else:
+        main(args.persistir, args.fsync)
@@ -1,87 +1,1079 @@
 import os
+import csv
+import json
+import time
+import pickle
+import re
+import hashlib
+import shutil
+import math
+import heapq
+import cProfile
+import argparse
 import webbrowser
-import tkinter as tk
-from tkinter import ttk, messagebox, scrolledtext
 import folium
+import numpy as np
 import networkx as nx
 import osmnx as ox
-from threading import Thread
+from scipy.spatial import cKDTree, Delaunay
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import minimum_spanning_tree
+from threading import Lock
+from collections import OrderedDict
+from itertools import chain
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
 
 # --- 1. LÓGICA PRINCIPAL (Cálculo y Visualización) ---
 
-def generar_datos_de_ruta(origen_nombre, destino_nombre, ciudades_interes, status_callback):
+class AlmacenDeGrafo:
     """
-    Motor del proyecto. Descarga datos y calcula la ruta.
-    Esta versión es 100% compatible con versiones antiguas de OSMnx.
+    Descarga la red vial una sola vez, la guarda en disco (pickle) y la
+    mantiene en memoria entre consultas. Si el archivo guardado es muy
+    antiguo o fue creado con otros parámetros, se reconstruye.
+    """
+    def __init__(self, lugar, tipo_red='drive', ruta_archivo=None, dias_de_validez=30, constructor=None):
+        self.lugar = lugar
+        self.tipo_red = tipo_red
+        self.ruta_archivo = ruta_archivo or os.path.join("cache", "red_vial.pkl")
+        self.dias_de_validez = dias_de_validez
+        # Permite reemplazar la descarga de OSM por otra fuente de grafos
+        self.constructor = constructor or self._descargar_grafo
+        self.grafo = None
+        self.metadatos = None
+        self.motores = {}  # Motores de ruta precalculados, por tipo de peso
+        self._motores_descartados = {}  # peso -> fecha de modificación de un archivo de motor que no sirve
+        self.tabla = None  # TablaDeAristas del grafo cargado
+        self.indice = None  # IndiceEspacial de los nodos del grafo cargado
+        self._nodos_de_ciudades = None  # Memo nombre -> nodo, persistido en disco
+        self._tamano = None  # (nodos, aristas) del grafo cargado
+        self._candado = Lock()
+
+    def _descargar_grafo(self):
+        return ox.graph_from_place(self.lugar, network_type=self.tipo_red, simplify=True)
+
+    def _parametros(self):
+        """Datos que deben coincidir para reutilizar un grafo guardado."""
+        return {"lugar": self.lugar, "tipo_red": self.tipo_red, "osmnx": ox.__version__}
+
+    def _esta_vencido(self, metadatos):
+        if metadatos.get("parametros") != self._parametros():
+            return True
+        edad_segundos = time.time() - metadatos.get("creado", 0)
+        return edad_segundos > self.dias_de_validez * 24 * 3600
+
+    def _cargar_de_disco(self):
+        if not os.path.exists(self.ruta_archivo):
+            return False
+        try:
+            with open(self.ruta_archivo, 'rb') as archivo:
+                datos = pickle.load(archivo)
+            if self._esta_vencido(datos["metadatos"]):
+                return False
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, KeyError, TypeError):
+            return False
+        self.grafo = datos["grafo"]
+        self.metadatos = datos["metadatos"]
+        if not self.metadatos.get("tiempos_de_viaje"):
+            # Grafo guardado antes de que existieran los pesos por tiempo
+            agregar_tiempos_de_viaje(self.grafo)
+            self.metadatos["tiempos_de_viaje"] = True
+            self._guardar()
+        return True
+
+    def _guardar(self):
+        carpeta = os.path.dirname(self.ruta_archivo)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+        # Se escribe en un archivo temporal para no dejar un pickle a medias
+        temporal = self.ruta_archivo + ".tmp"
+        with open(temporal, 'wb') as archivo:
+            pickle.dump({"metadatos": self.metadatos, "grafo": self.grafo}, archivo, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporal, self.ruta_archivo)
+
+    def _construir_y_guardar(self):
+        grafo = self.constructor()
+        # Los pesos por tiempo se calculan una sola vez, al construir el grafo
+        agregar_tiempos_de_viaje(grafo)
+        creado = time.time()
+        huella = f"{self._parametros()}|{creado}|{grafo.number_of_nodes()}|{grafo.number_of_edges()}"
+        self.metadatos = {
+            "parametros": self._parametros(),
+            "creado": creado,
+            "version": hashlib.sha1(huella.encode('utf-8')).hexdigest(),
+            "tiempos_de_viaje": True,
+        }
+        self.grafo = grafo
+        self._guardar()
+
+    def obtener(self, status_callback=None):
+        """
+        Devuelve el grafo en memoria. La primera vez lo lee de disco o,
+        si no existe o está vencido, lo descarga y lo guarda.
+        """
+        with self._candado:
+            if self.grafo is not None:
+                return self.grafo
+            if status_callback:
+                status_callback("Cargando red vial guardada...")
+            if not self._cargar_de_disco():
+                if status_callback:
+                    status_callback("Iniciando: Descargando red vial...")
+                self._construir_y_guardar()
+            return self.grafo
+
+    @property
+    def version(self):
+        """Identificador del grafo cargado; cambia cada vez que se reconstruye."""
+        return self.metadatos["version"] if self.metadatos else None
+
+    def invalidar(self):
+        """Olvida el grafo en memoria y en disco para forzar una nueva descarga."""
+        with self._candado:
+            self.grafo = None
+            self.metadatos = None
+            self.motores = {}
+            self._motores_descartados = {}
+            self.tabla = None
+            self.indice = None
+            self._nodos_de_ciudades = None
+            self._tamano = None
+            if os.path.exists(self.ruta_archivo):
+                os.remove(self.ruta_archivo)
+
+    def obtener_tabla(self, status_callback=None):
+        """Devuelve la TablaDeAristas del grafo, construyéndola una sola vez por carga."""
+        G = self.obtener(status_callback)
+        with self._candado:
+            if self.tabla is None:
+                self.tabla = TablaDeAristas(G)
+            return self.tabla
+
+    def tamano(self, status_callback=None):
+        """(nodos, aristas) del grafo. Contar aristas recorre todo el grafo, así que se hace una vez por carga."""
+        G = self.obtener(status_callback)
+        with self._candado:
+            if self._tamano is None:
+                self._tamano = (G.number_of_nodes(), G.number_of_edges())
+            return self._tamano
+
+    def obtener_indice(self, status_callback=None):
+        """Devuelve el IndiceEspacial de los nodos, construido una sola vez por carga."""
+        G = self.obtener(status_callback)
+        with self._candado:
+            if self.indice is None:
+                self.indice = IndiceEspacial(G)
+            return self.indice
+
+    def _ruta_memo_ciudades(self):
+        return f"{os.path.splitext(self.ruta_archivo)[0]}.nodos_ciudades.json"
+
+    def nodos_de_ciudades(self, ciudades_interes, nombres=None, status_callback=None):
+        """
+        Devuelve {nombre: nodo} para las ciudades pedidas. Las ciudades ya ubicadas
+        se leen del memo (en memoria y en disco); las nuevas, o aquellas cuyas
+        coordenadas cambiaron, se ubican juntas en una sola consulta al índice.
+        El memo se descarta cuando cambia la versión del grafo.
+        """
+        indice = self.obtener_indice(status_callback)
+        nombres = list(ciudades_interes) if nombres is None else list(nombres)
+        with self._candado:
+            if self._nodos_de_ciudades is None:
+                self._nodos_de_ciudades = {}
+                try:
+                    with open(self._ruta_memo_ciudades(), encoding='utf-8') as archivo:
+                        datos = json.load(archivo)
+                    if datos.get("version") == self.version:
+                        self._nodos_de_ciudades = datos["nodos"]
+                except (OSError, ValueError, KeyError):
+                    pass
+            memo = self._nodos_de_ciudades
+
+            faltantes = [n for n in nombres if n not in memo or memo[n]["pos"] != list(ciudades_interes[n]['pos'])]
+            if faltantes:
+                coordenadas = [ciudades_interes[n]['pos'] for n in faltantes]
+                for nombre, nodo in zip(faltantes, indice.nodos_mas_cercanos(coordenadas)):
+                    memo[nombre] = {"pos": list(ciudades_interes[nombre]['pos']), "nodo": nodo}
+                try:
+                    with open(self._ruta_memo_ciudades(), 'w', encoding='utf-8') as archivo:
+                        json.dump({"version": self.version, "nodos": memo}, archivo, ensure_ascii=False)
+                except (OSError, TypeError):
+                    pass  # El memo en disco es solo una optimización
+            return {n: memo[n]["nodo"] for n in nombres}
+
+    def _ruta_motor(self, peso):
+        return f"{os.path.splitext(self.ruta_archivo)[0]}.alt_{peso}.pkl"
+
+    def preparar_motor(self, peso='length', num_referencias=8, status_callback=None):
+        """
+        Preprocesa el grafo con MotorALT y lo guarda junto al grafo.
+        Es lento (2 Dijkstra completos por punto de referencia), pero se hace una sola vez.
+        """
+        G = self.obtener(status_callback)
+        if status_callback:
+            status_callback(f"Preprocesando motor de rutas ({num_referencias} referencias)...")
+        motor = MotorALT(G, peso=peso, num_referencias=num_referencias)
+        temporal = self._ruta_motor(peso) + ".tmp"
+        with open(temporal, 'wb') as archivo:
+            pickle.dump({"version": self.version, "motor": motor}, archivo, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporal, self._ruta_motor(peso))
+        with self._candado:
+            self.motores[peso] = motor
+        return motor
+
+    def obtener_motor(self, peso='length'):
+        """
+        Devuelve el motor precalculado para este grafo si existe en disco,
+        o None si nunca se preparó o corresponde a otra versión del grafo.
+        Solo se memoriza un motor válido: si falta, se vuelve a buscar en cada
+        llamada (un servidor en marcha toma el que prepare luego --preparar-motor),
+        y un archivo que no sirve se relee solo cuando cambia su fecha de modificación.
+        """
+        ruta = self._ruta_motor(peso)
+        with self._candado:
+            if peso in self.motores:
+                return self.motores[peso]
+            try:
+                modificado = os.path.getmtime(ruta)
+            except OSError:
+                return None
+            if self._motores_descartados.get(peso) == modificado:
+                return None
+            motor = None
+            try:
+                with open(ruta, 'rb') as archivo:
+                    datos = pickle.load(archivo)
+                if datos["version"] == self.version:
+                    motor = datos["motor"]
+            except (OSError, pickle.UnpicklingError, EOFError, AttributeError, KeyError, TypeError):
+                pass
+            if motor is None:
+                self._motores_descartados[peso] = modificado
+            else:
+                self.motores[peso] = motor
+            return motor
+
+class MotorALT:
+    """
+    Motor de rutas A* con puntos de referencia (ALT: A*, Landmarks, Triangle inequality).
+    Se preprocesa una vez: se eligen puntos de referencia alejados entre sí y se
+    guardan las distancias desde y hacia cada uno. En cada consulta, la desigualdad
+    triangular da una cota inferior exacta de la distancia restante, por lo que A*
+    encuentra el mismo costo mínimo que Dijkstra explorando muchos menos nodos.
+    """
+    def __init__(self, G, peso='length', num_referencias=8):
+        self.peso = peso
+        self.nodos = list(G.nodes)
+        indice = {nodo: i for i, nodo in enumerate(self.nodos)}
+        self.indice = indice
+        n = len(self.nodos)
+
+        # Listas de adyacencia compactas; de las aristas paralelas se toma la más corta
+        mejores = {}
+        for u, v, datos in G.edges(data=True):
+            w = datos.get(peso, 0)
+            clave = (indice[u], indice[v])
+            if w < mejores.get(clave, float('inf')):
+                mejores[clave] = w
+        self.adyacentes = [[] for _ in range(n)]
+        inversos = [[] for _ in range(n)]
+        for (i, j), w in mejores.items():
+            self.adyacentes[i].append((j, w))
+            inversos[j].append((i, w))
+
+        # Selección de referencias: cada una es el nodo más lejano de las anteriores
+        self.desde_referencia = []  # d(L, v)
+        self.hacia_referencia = []  # d(v, L)
+        cercania = [float('inf')] * n
+        siguiente = 0
+        for _ in range(min(num_referencias, n)):
+            desde = self._dijkstra_completo(siguiente, self.adyacentes)
+            self.desde_referencia.append(desde)
+            self.hacia_referencia.append(self._dijkstra_completo(siguiente, inversos))
+            cercania = [min(c, d) for c, d in zip(cercania, desde)]
+            alcanzables = [(c, i) for i, c in enumerate(cercania) if c != float('inf')]
+            siguiente = max(alcanzables)[1] if alcanzables else 0
+
+    @staticmethod
+    def _dijkstra_completo(origen, adyacentes):
+        distancias = [float('inf')] * len(adyacentes)
+        distancias[origen] = 0
+        pendientes = [(0, origen)]
+        while pendientes:
+            d, u = heapq.heappop(pendientes)
+            if d > distancias[u]:
+                continue
+            for v, w in adyacentes[u]:
+                nueva = d + w
+                if nueva < distancias[v]:
+                    distancias[v] = nueva
+                    heapq.heappush(pendientes, (nueva, v))
+        return distancias
+
+    def _heuristica(self, v, cotas_destino):
+        mejor = 0
+        infinito = float('inf')
+        for desde, hacia, (desde_t, hacia_t) in zip(self.desde_referencia, self.hacia_referencia, cotas_destino):
+            # d(v,t) >= d(L,t) - d(L,v)   y   d(v,t) >= d(v,L) - d(t,L)
+            desde_v = desde[v]
+            if desde_t != infinito and desde_v != infinito and desde_t - desde_v > mejor:
+                mejor = desde_t - desde_v
+            hacia_v = hacia[v]
+            if hacia_t != infinito and hacia_v != infinito and hacia_v - hacia_t > mejor:
+                mejor = hacia_v - hacia_t
+        return mejor
+
+    def ruta_mas_corta(self, origen, destino):
+        """Devuelve la lista de nodos de la ruta de costo mínimo, igual que nx.shortest_path."""
+        s, t = self.indice[origen], self.indice[destino]
+        cotas_destino = [(desde[t], hacia[t]) for desde, hacia in zip(self.desde_referencia, self.hacia_referencia)]
+        costos = {s: 0}
+        previos = {s: None}
+        cerrados = set()
+        pendientes = [(self._heuristica(s, cotas_destino), 0, s)]
+        while pendientes:
+            _, g, u = heapq.heappop(pendientes)
+            if u in cerrados:
+                continue
+            if u == t:
+                ruta = []
+                while u is not None:
+                    ruta.append(self.nodos[u])
+                    u = previos[u]
+                return ruta[::-1]
+            cerrados.add(u)
+            for v, w in self.adyacentes[u]:
+                nuevo = g + w
+                if v not in cerrados and nuevo < costos.get(v, float('inf')):
+                    costos[v] = nuevo
+                    previos[v] = u
+                    heapq.heappush(pendientes, (nuevo + self._heuristica(v, cotas_destino), nuevo, v))
+        raise nx.NetworkXNoPath(f"No hay ruta entre {origen} y {destino}.")
+
+class IndiceEspacial:
+    """
+    Árbol KD (scipy cKDTree) sobre los nodos del grafo para ubicar muchas
+    coordenadas a la vez. Los nodos se proyectan a la esfera unitaria en 3D:
+    la distancia recta entre dos puntos crece igual que la distancia sobre la
+    Tierra, así que el vecino más cercano es exacto. Espera un grafo sin
+    proyectar (x = longitud, y = latitud), como el que entrega OSMnx.
+    """
+    def __init__(self, G):
+        self.nodos = list(G.nodes)
+        latitudes = np.fromiter((G.nodes[n]['y'] for n in self.nodos), dtype=np.float64, count=len(self.nodos))
+        longitudes = np.fromiter((G.nodes[n]['x'] for n in self.nodos), dtype=np.float64, count=len(self.nodos))
+        self.arbol = cKDTree(self._a_esfera(latitudes, longitudes))
+
+    @staticmethod
+    def _a_esfera(latitudes, longitudes):
+        lat = np.radians(latitudes)
+        lon = np.radians(longitudes)
+        return np.column_stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)))
+
+    def nodos_mas_cercanos(self, coordenadas):
+        """Recibe una lista de (lat, lon) y devuelve el nodo más cercano a cada una."""
+        puntos = np.asarray(coordenadas, dtype=np.float64).reshape(-1, 2)
+        _, posiciones = self.arbol.query(self._a_esfera(puntos[:, 0], puntos[:, 1]))
+        return [self.nodos[i] for i in posiciones.tolist()]
+
+    def nodo_mas_cercano(self, lat, lon):
+        return self.nodos_mas_cercanos([(lat, lon)])[0]
+
+VELOCIDAD_PROMEDIO_KMH = 50
+
+# Velocidades típicas (km/h) por tipo de vía, para tramos sin 'maxspeed'
+VELOCIDADES_POR_TIPO = {
+    'motorway': 100, 'trunk': 90, 'primary': 80, 'secondary': 60, 'tertiary': 50,
+    'unclassified': 40, 'residential': 30, 'living_street': 20, 'service': 20,
+    'track': 20, 'road': 40,
+}
+
+# Pesos con los que se puede calcular una ruta: la más corta o la más rápida
+PESOS_DE_RUTA = ('length', 'travel_time')
+
+def _velocidad_por_tipo(highway):
+    if isinstance(highway, list):
+        velocidades = [_velocidad_por_tipo(tipo) for tipo in highway]
+        return sum(velocidades) / len(velocidades) if velocidades else VELOCIDAD_PROMEDIO_KMH
+    tipo = str(highway or '').replace('_link', '')
+    return VELOCIDADES_POR_TIPO.get(tipo, VELOCIDAD_PROMEDIO_KMH)
+
+def agregar_tiempos_de_viaje(G):
+    """
+    Agrega a cada arista 'speed_kph' (de 'maxspeed' o, si falta, del tipo de vía)
+    y 'travel_time' en segundos, con los mismos nombres que usa OSMnx.
     """
+    for _, _, datos in G.edges(data=True):
+        velocidad = _velocidad_kmh(datos.get('maxspeed'), _velocidad_por_tipo(datos.get('highway')))
+        datos['speed_kph'] = velocidad
+        datos['travel_time'] = datos.get('length', 0) / (velocidad / 3.6)
+    return G
+
+def _velocidad_kmh(maxspeed, por_defecto):
+    """Interpreta el atributo 'maxspeed' de OSM ('60', '60 mph', '80;60', ['60', '80'])."""
+    if isinstance(maxspeed, list):
+        maxspeed = maxspeed[0]
+    if not maxspeed:
+        return por_defecto
+    texto = str(maxspeed).split(';')[0].strip()
+    numero = texto.split()[0] if texto.split() else ''
     try:
-        status_callback("Iniciando: Descargando red vial...")
-        G = ox.graph_from_place("Provincia de San Román, Puno, Peru", network_type='drive', simplify=True)
-        status_callback("Red descargada. Buscando nodos...")
-
-        origen_coords = ciudades_interes[origen_nombre]['pos']
-        destino_coords = ciudades_interes[destino_nombre]['pos']
-        nodo_origen = ox.nearest_nodes(G, X=origen_coords[1], Y=origen_coords[0])
-        nodo_destino = ox.nearest_nodes(G, X=destino_coords[1], Y=destino_coords[0])
-        status_callback("Nodos encontrados. Calculando ruta...")
-
-        ruta = nx.shortest_path(G, source=nodo_origen, target=nodo_destino, weight='length')
-        status_callback("Ruta calculada. Procesando detalles del viaje...")
-
-        # --- CÁLCULO MANUAL DE DISTANCIA Y CALLES (Compatible con versiones antiguas) ---
-        distancia_total_m = 0
-        lista_de_calles = []
-
-        # Recorremos la ruta tramo por tramo (de un nodo al siguiente)
-        for u, v in zip(ruta[:-1], ruta[1:]):
-            # Obtenemos los datos del tramo (edge) entre el nodo u y el nodo v
-            # Usamos [0] porque puede haber múltiples aristas paralelas
-            edge_data = G.get_edge_data(u, v)[0]
-            
-            # Sumamos la longitud de este tramo al total
-            # Usamos .get() para evitar errores si un tramo no tuviera longitud
-            distancia_total_m += edge_data.get('length', 0)
-            
-            # Obtenemos el nombre de la calle de este tramo
-            nombre_calle = edge_data.get('name', None)
-            
-            # Si la calle tiene un nombre y no es el mismo que el anterior, lo añadimos a la lista
-            if nombre_calle:
-                # A veces el nombre es una lista, tomamos el primero
-                if isinstance(nombre_calle, list):
-                    nombre_calle = nombre_calle[0]
-                
-                if not lista_de_calles or lista_de_calles[-1] != nombre_calle:
-                    lista_de_calles.append(nombre_calle)
-        
-        distancia_km = distancia_total_m / 1000
-        if not lista_de_calles:
-            lista_de_calles = ["Rutas sin nombre definido"]
+        velocidad = float(numero)
+    except ValueError:
+        return por_defecto
+    if 'mph' in texto:
+        velocidad *= 1.609344
+    return velocidad if velocidad > 0 else por_defecto
 
-        tiempo_estimado_horas = distancia_km / 50
-        tiempo_minutos = tiempo_estimado_horas * 60
-        status_callback("Detalles procesados. Generando mapa...")
+class TablaDeAristas:
+    """
+    Atributos de las aristas en arreglos de NumPy (longitud, tiempo e id del nombre
+    de la calle), con la fila de la arista paralela que elige Dijkstra para cada (u, v).
+    Permite resumir una ruta con operaciones vectorizadas en lugar de consultar el
+    grafo tramo por tramo.
+    """
+    def __init__(self, G):
+        m = G.number_of_edges()
+        self.longitudes = np.zeros(m, dtype=np.float64)
+        self.tiempos = np.zeros(m, dtype=np.float64)  # segundos
+        self.nombres_id = np.full(m, -1, dtype=np.int32)  # -1 = calle sin nombre
+        self.nombres = []  # Nombres internados: cada nombre se guarda una vez
+        ids_de_nombres = {}
+        self.mejor = {}   # (u, v) -> fila de la arista paralela más corta
+        self.mas_rapida = {}  # (u, v) -> fila de la arista paralela más rápida
 
-        mapa, nombre_archivo = crear_mapa_visual(G, ruta, origen_nombre, destino_nombre, ciudades_interes)
-        webbrowser.open('file://' + os.path.realpath(nombre_archivo))
-        
+        for fila, (u, v, datos) in enumerate(G.edges(data=True)):
+            self.longitudes[fila] = datos.get('length', 0)
+            velocidad = datos.get('speed_kph') or _velocidad_kmh(datos.get('maxspeed'), _velocidad_por_tipo(datos.get('highway')))
+            self.tiempos[fila] = datos.get('travel_time', self.longitudes[fila] / (velocidad / 3.6))
+            nombre = datos.get('name')
+            # A veces el nombre es una lista, tomamos el primero
+            if isinstance(nombre, list):
+                nombre = nombre[0] if nombre else None
+            if nombre:
+                if nombre not in ids_de_nombres:
+                    ids_de_nombres[nombre] = len(self.nombres)
+                    self.nombres.append(nombre)
+                self.nombres_id[fila] = ids_de_nombres[nombre]
+            actual = self.mejor.get((u, v))
+            if actual is None or self.longitudes[fila] < self.longitudes[actual]:
+                self.mejor[(u, v)] = fila
+            actual = self.mas_rapida.get((u, v))
+            if actual is None or self.tiempos[fila] < self.tiempos[actual]:
+                self.mas_rapida[(u, v)] = fila
+
+    def filas_de_ruta(self, ruta, peso='length'):
+        """Filas de las aristas recorridas: entre paralelas, la de menor peso (la que elige Dijkstra)."""
+        mejor = self.mas_rapida if peso == 'travel_time' else self.mejor
+        return np.fromiter((mejor[(u, v)] for u, v in zip(ruta[:-1], ruta[1:])),
+                           dtype=np.int64, count=max(len(ruta) - 1, 0))
+
+    def resumir_ruta(self, ruta, peso='length'):
+        """
+        Devuelve (distancia en metros, tiempo en horas, calles) de una ruta.
+        Las calles repetidas de forma consecutiva se cuentan una sola vez.
+        """
+        filas = self.filas_de_ruta(ruta, peso)
+        distancia_m = float(self.longitudes[filas].sum())
+        tiempo_h = float(self.tiempos[filas].sum()) / 3600
+
+        ids = self.nombres_id[filas]
+        ids = ids[ids >= 0]
+        if ids.size:
+            ids = ids[np.concatenate(([True], ids[1:] != ids[:-1]))]
+        calles = [self.nombres[i] for i in ids.tolist()]
+        return distancia_m, tiempo_h, calles
+
+# --- Red vial sintética (pruebas de escala sin conexión) ---
+
+LIMITES_SAN_ROMAN = (-15.75, -70.65, -15.25, -69.9)  # (sur, oeste, norte, este)
+TIPOS_DE_RED_SINTETICA = ('grilla', 'geometrica')
+RADIO_TIERRA_M = 6_371_009
+
+def _distancias_haversine(lat1, lon1, lat2, lon2):
+    """Distancias en metros entre arreglos de coordenadas en grados."""
+    lat1, lon1, lat2, lon2 = (np.radians(a) for a in (lat1, lon1, lat2, lon2))
+    h = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * RADIO_TIERRA_M * np.arcsin(np.sqrt(h))
+
+def _aristas_de_grilla(nodos, azar, limites):
+    """Grilla de calles (filas) y avenidas (columnas); cada décima es una vía principal."""
+    sur, oeste, norte, este = limites
+    columnas = math.ceil(math.sqrt(nodos))
+    filas = math.ceil(nodos / columnas)
+    indices = np.arange(nodos)
+    fila, columna = indices // columnas, indices % columnas
+    # Un poco de ruido en las esquinas para que no todas las rutas empaten
+    lat = sur + (norte - sur) * (fila + azar.uniform(-0.2, 0.2, nodos)) / max(filas - 1, 1)
+    lon = oeste + (este - oeste) * (columna + azar.uniform(-0.2, 0.2, nodos)) / max(columnas - 1, 1)
+
+    horizontales = indices[(columna + 1 < columnas) & (indices + 1 < nodos)]
+    verticales = indices[indices + columnas < nodos]
+    origenes = np.concatenate((horizontales, verticales))
+    destinos = np.concatenate((horizontales + 1, verticales + columnas))
+    es_calle = np.arange(len(origenes)) < len(horizontales)
+    numero = np.where(es_calle, fila[origenes], columna[origenes])
+    nombres = [f"Calle {n + 1}" if calle else f"Avenida {n + 1}" for calle, n in zip(es_calle.tolist(), numero.tolist())]
+    principales = numero % 10 == 0
+    return lat, lon, origenes, destinos, nombres, principales
+
+def _aristas_geometricas(nodos, azar, limites):
+    """
+    Puntos al azar unidos como una red vial: el árbol de expansión mínima de la
+    triangulación de Delaunay (garantiza que todo esté conectado) más un tercio
+    de las demás aristas de la triangulación (da rutas alternativas).
+    """
+    sur, oeste, norte, este = limites
+    lat = azar.uniform(sur, norte, nodos)
+    lon = azar.uniform(oeste, este, nodos)
+    # Coordenadas planas aproximadas en metros para triangular
+    plano = np.column_stack((lon * math.cos(math.radians((sur + norte) / 2)), lat)) * 111_320
+    triangulos = Delaunay(plano).simplices
+    pares = np.concatenate((triangulos[:, [0, 1]], triangulos[:, [1, 2]], triangulos[:, [0, 2]]))
+    pares = np.unique(np.sort(pares, axis=1), axis=0)
+    largos = np.hypot(*(plano[pares[:, 0]] - plano[pares[:, 1]]).T)
+
+    arbol = minimum_spanning_tree(coo_matrix((largos, (pares[:, 0], pares[:, 1])), shape=(nodos, nodos))).tocoo()
+    # Cada par (u, v) con u < v se codifica como un solo entero para compararlos en bloque
+    claves_arbol = np.minimum(arbol.row, arbol.col).astype(np.int64) * nodos + np.maximum(arbol.row, arbol.col)
+    elegidas = np.isin(pares[:, 0].astype(np.int64) * nodos + pares[:, 1], claves_arbol)
+    elegidas |= azar.random(len(pares)) < 1 / 3
+    origenes, destinos = pares[elegidas, 0], pares[elegidas, 1]
+
+    # Los tramos de una misma zona comparten nombre, como las cuadras de un jirón
+    celdas = max(1, math.isqrt(nodos // 30))
+    medio_lat = ((lat[origenes] + lat[destinos]) / 2 - sur) / (norte - sur)
+    medio_lon = ((lon[origenes] + lon[destinos]) / 2 - oeste) / (este - oeste)
+    celda = np.minimum((medio_lat * celdas).astype(int), celdas - 1) * celdas + np.minimum((medio_lon * celdas).astype(int), celdas - 1)
+    nombres = [f"Jirón {c + 1}" for c in celda.tolist()]
+    principales = azar.random(len(origenes)) < 0.1
+    return lat, lon, origenes, destinos, nombres, principales
+
+def generar_red_sintetica(nodos=10_000, tipo='grilla', semilla=0, limites=LIMITES_SAN_ROMAN):
+    """
+    Genera una red vial falsa con la misma forma que las de OSMnx (MultiDiGraph
+    con crs, nodos con x/y/street_count y aristas en ambos sentidos con osmid,
+    length, name, highway, oneway, reversed y maxspeed en las vías principales),
+    para medir el motor de rutas a escala de provincia o región sin conexión.
+    tipo='grilla' es una cuadrícula; tipo='geometrica', puntos al azar unidos
+    por una triangulación. Con la misma semilla el grafo es siempre el mismo.
+    Por defecto cubre la zona de San Román, así que CIUDADES_DE_INTERES sirve.
+    Ojo: como en OSMnx, un millón de nodos ocupa varios GB de memoria.
+    """
+    if tipo not in TIPOS_DE_RED_SINTETICA:
+        raise ValueError(f"Tipo de red desconocido: {tipo}. Use uno de {', '.join(TIPOS_DE_RED_SINTETICA)}.")
+    if nodos < 4:
+        raise ValueError("La red sintética necesita al menos 4 nodos.")
+    azar = np.random.default_rng(semilla)
+    construir = _aristas_de_grilla if tipo == 'grilla' else _aristas_geometricas
+    lat, lon, origenes, destinos, nombres, principales = construir(nodos, azar, limites)
+    # Las calles no son rectas: la longitud es algo mayor que la distancia en línea recta
+    longitudes = _distancias_haversine(lat[origenes], lon[origenes], lat[destinos], lon[destinos]) * azar.uniform(1.0, 1.15, len(origenes))
+    calles_por_nodo = np.bincount(np.concatenate((origenes, destinos)), minlength=nodos)
+
+    G = nx.MultiDiGraph(crs="epsg:4326", sintetica={"tipo": tipo, "nodos": nodos, "semilla": semilla})
+    G.add_nodes_from((i, {"y": y, "x": x, "street_count": c})
+                     for i, (y, x, c) in enumerate(zip(lat.tolist(), lon.tolist(), calles_por_nodo.tolist())))
+
+    def aristas():
+        for osmid, (u, v, largo, nombre, principal) in enumerate(zip(origenes.tolist(), destinos.tolist(), longitudes.tolist(),
+                                                                      nombres, principales.tolist())):
+            datos = {"osmid": osmid, "length": largo, "name": nombre, "oneway": False, "reversed": False,
+                     "highway": "primary" if principal else "residential"}
+            if principal:
+                datos["maxspeed"] = "60"
+            yield u, v, datos
+            yield v, u, dict(datos, reversed=True)
+    G.add_edges_from(aristas())
+    return G
+
+def almacen_sintetico(nodos=10_000, tipo='grilla', semilla=0, carpeta="cache"):
+    """
+    AlmacenDeGrafo que usa una red sintética en lugar de descargar de OSM:
+    se genera la primera vez y luego se lee del pickle, igual que la real.
+    """
+    return AlmacenDeGrafo(f"red sintética {tipo} de {nodos} nodos (semilla {semilla})",
+                          ruta_archivo=os.path.join(carpeta, f"red_sintetica_{tipo}_{nodos}_{semilla}.pkl"),
+                          constructor=lambda: generar_red_sintetica(nodos, tipo, semilla))
+
+
+ALMACEN_SAN_ROMAN = AlmacenDeGrafo("Provincia de San Román, Puno, Peru", ruta_archivo=os.path.join("cache", "red_vial_san_roman.pkl"))
+
+class CacheDeRutas:
+    """
+    Memoriza rutas ya calculadas con una política LRU (se descarta la menos usada)
+    y, si se indica una carpeta, una copia en disco (un JSON por ruta). La clave incluye
+    la versión del grafo, así que al reconstruir la red las rutas viejas dejan de usarse.
+    En disco todo va dentro de carpeta/rutas_cache, con una subcarpeta por versión
+    (el hash sha1 del grafo): las de otras versiones se borran y, si se superan
+    maximo_en_disco rutas, se descartan las más antiguas. Solo se tocan las
+    subcarpetas y archivos con nombre de hash, nunca el resto de la carpeta.
+    """
+    SUBCARPETA = "rutas_cache"
+    _NOMBRE_DE_HASH = re.compile(r"[0-9a-f]{40}")
+
+    def __init__(self, capacidad=256, carpeta=None, maximo_en_disco=4096):
+        self.capacidad = capacidad
+        self.carpeta = carpeta
+        self.maximo_en_disco = maximo_en_disco
+        self._entradas = OrderedDict()
+        self._candado = Lock()
+        self._candado_disco = Lock()
+        self._rutas_en_disco = {}  # versión -> nº de rutas en su subcarpeta
+        self.aciertos = 0
+        self.aciertos_disco = 0
+        self.fallos = 0
+
+    @staticmethod
+    def clave(origen, destino, ciudades_interes, peso, version):
+        return json.dumps([origen, ciudades_interes[origen]['pos'], destino, ciudades_interes[destino]['pos'],
+                           peso, version], ensure_ascii=False)
+
+    def _raiz(self):
+        return os.path.join(self.carpeta, self.SUBCARPETA)
+
+    def _carpeta_de_version(self, clave):
+        """Subcarpeta de la versión del grafo, o None si no tiene formato de hash (no se guarda en disco)."""
+        version = json.loads(clave)[-1]
+        if not (isinstance(version, str) and self._NOMBRE_DE_HASH.fullmatch(version)):
+            return None
+        return os.path.join(self._raiz(), version)
+
+    def _archivo(self, clave):
+        carpeta_version = self._carpeta_de_version(clave)
+        if carpeta_version is None:
+            return None
+        return os.path.join(carpeta_version, hashlib.sha1(clave.encode('utf-8')).hexdigest() + ".json")
+
+    def _subcarpetas_de_versiones(self):
+        raiz = self._raiz()
+        if not os.path.isdir(raiz):
+            return []
+        return [os.path.join(raiz, nombre) for nombre in os.listdir(raiz)
+                if self._NOMBRE_DE_HASH.fullmatch(nombre) and os.path.isdir(os.path.join(raiz, nombre))]
+
+    def _rutas_guardadas(self, carpeta_version):
+        return [os.path.join(carpeta_version, nombre) for nombre in os.listdir(carpeta_version)
+                if nombre.endswith(".json") and self._NOMBRE_DE_HASH.fullmatch(nombre[:-5])]
+
+    def _podar_disco(self, carpeta_version):
+        """
+        Mantiene acotada la copia en disco. La primera vez que se escribe una versión
+        borra las subcarpetas de las demás; después, si hay más de maximo_en_disco rutas,
+        elimina las más antiguas hasta quedarse con tres cuartas partes.
+        Se llama con _candado_disco tomado.
+        """
+        if carpeta_version not in self._rutas_en_disco:
+            for ruta in self._subcarpetas_de_versiones():
+                if ruta != carpeta_version:
+                    shutil.rmtree(ruta, ignore_errors=True)
+            self._rutas_en_disco = {carpeta_version: len(self._rutas_guardadas(carpeta_version))}
+        if self._rutas_en_disco[carpeta_version] <= self.maximo_en_disco:
+            return
+        archivos = self._rutas_guardadas(carpeta_version)
+        archivos.sort(key=os.path.getmtime)
+        sobrantes = len(archivos) - self.maximo_en_disco * 3 // 4
+        for ruta in archivos[:max(sobrantes, 0)]:
+            os.remove(ruta)
+        self._rutas_en_disco[carpeta_version] = len(archivos) - max(sobrantes, 0)
+
+    def _guardar_en_memoria(self, clave, entrada):
+        self._entradas[clave] = entrada
+        self._entradas.move_to_end(clave)
+        while len(self._entradas) > self.capacidad:
+            self._entradas.popitem(last=False)
+
+    def obtener(self, clave):
+        """Devuelve la entrada guardada ({'resultado', 'ruta'}) o None."""
+        return self.obtener_con_origen(clave)[0]
+
+    def obtener_con_origen(self, clave):
+        """Como obtener(), pero devuelve (entrada, 'memoria' | 'disco' | 'fallo')."""
+        with self._candado:
+            if clave in self._entradas:
+                self._entradas.move_to_end(clave)
+                self.aciertos += 1
+                return self._entradas[clave], "memoria"
+        entrada = None
+        if self.carpeta and self._archivo(clave):
+            try:
+                with open(self._archivo(clave), encoding='utf-8') as archivo:
+                    entrada = json.load(archivo)
+            except (OSError, ValueError):
+                entrada = None
+        with self._candado:
+            if entrada is None:
+                self.fallos += 1
+            else:
+                self.aciertos += 1
+                self.aciertos_disco += 1
+                self._guardar_en_memoria(clave, entrada)
+        return entrada, "fallo" if entrada is None else "disco"
+
+    def guardar(self, clave, resultado, ruta):
+        entrada = {"resultado": resultado, "ruta": ruta}
+        with self._candado:
+            self._guardar_en_memoria(clave, entrada)
+        if self.carpeta and self._carpeta_de_version(clave):
+            try:
+                with self._candado_disco:
+                    carpeta_version = self._carpeta_de_version(clave)
+                    os.makedirs(carpeta_version, exist_ok=True)
+                    destino = self._archivo(clave)
+                    nueva = not os.path.exists(destino)
+                    temporal = destino + ".tmp"
+                    with open(temporal, 'w', encoding='utf-8') as archivo:
+                        json.dump(entrada, archivo, ensure_ascii=False)
+                    os.replace(temporal, destino)
+                    if nueva and carpeta_version in self._rutas_en_disco:
+                        self._rutas_en_disco[carpeta_version] += 1
+                    self._podar_disco(carpeta_version)
+            except (OSError, TypeError):
+                pass  # La copia en disco es opcional
+
+    def limpiar(self):
+        with self._candado:
+            self._entradas.clear()
+        if self.carpeta:
+            with self._candado_disco:
+                for ruta in self._subcarpetas_de_versiones():
+                    shutil.rmtree(ruta, ignore_errors=True)
+                self._rutas_en_disco = {}
+
+    def estadisticas(self):
+        with self._candado:
+            consultas = self.aciertos + self.fallos
+            return {
+                "aciertos": self.aciertos,
+                "aciertos_disco": self.aciertos_disco,
+                "fallos": self.fallos,
+                "tasa_aciertos": round(self.aciertos / consultas, 3) if consultas else 0.0,
+                "entradas": len(self._entradas),
+                "capacidad": self.capacidad,
+            }
+
+# Solo en memoria; la copia en disco se activa con --cache-disco CARPETA
+CACHE_DE_RUTAS = CacheDeRutas(capacidad=256)
+
+# --- Instrumentación: tiempos por fase y perfil de cada petición ---
+
+class MedidorDeFases:
+    """
+    Mide cada fase de un cálculo: tiempo de reloj (perf_counter) y de CPU del
+    hilo actual (thread_time, así no se cuenta el trabajo de otros hilos del
+    servidor). Una fase que se repite acumula sus tiempos. En 'datos' se anotan
+    otras métricas de la petición (tamaño del grafo, tramos, uso de la cache...).
+    """
+    def __init__(self):
+        self.fases = {}
+        self.datos = {}
+        self._inicio = time.perf_counter()
+        self._inicio_cpu = time.thread_time()
+
+    @contextmanager
+    def fase(self, nombre):
+        reloj, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            medida = self.fases.setdefault(nombre, {"ms": 0.0, "cpu_ms": 0.0})
+            medida["ms"] += (time.perf_counter() - reloj) * 1000
+            medida["cpu_ms"] += (time.thread_time() - cpu) * 1000
+
+    def resumen(self):
+        """Dict serializable en JSON con las fases, los totales y los datos anotados."""
         return {
-            "distancia": f"{distancia_km:.2f} km",
-            "tiempo": f"{int(tiempo_minutos)} minutos",
-            "calles": lista_de_calles,
-            "status": "¡Cálculo completado!"
+            "fases": {nombre: {clave: round(valor, 3) for clave, valor in medida.items()}
+                      for nombre, medida in self.fases.items()},
+            "total_ms": round((time.perf_counter() - self._inicio) * 1000, 3),
+            "cpu_ms": round((time.thread_time() - self._inicio_cpu) * 1000, 3),
+            **self.datos,
         }
 
+def describir_metricas(metricas):
+    """Una línea para la barra de estado, p. ej. 'Total 12.4 ms (CPU 11.9) · ruta 10.2 · ... · cache: fallo'."""
+    partes = [f"Total {metricas['total_ms']:.1f} ms (CPU {metricas['cpu_ms']:.1f})"]
+    partes += [f"{nombre} {medida['ms']:.1f}" for nombre, medida in metricas["fases"].items()]
+    if "nodos" in metricas:
+        partes.append(f"{metricas['nodos']} nodos/{metricas['aristas']} aristas")
+    if "tramos" in metricas:
+        partes.append(f"{metricas['tramos']} tramos")
+    if "cache" in metricas:
+        partes.append(f"cache: {metricas['cache']}")
+    return " · ".join(partes)
+
+def _iniciar_perfil(carpeta):
+    """Activa cProfile para esta petición si se pidió una carpeta de perfiles."""
+    if not carpeta:
+        return None
+    perfilador = cProfile.Profile()
+    try:
+        perfilador.enable()
+    except ValueError:
+        return None  # Ya hay otro perfilador activo en este proceso
+    return perfilador
+
+def _guardar_perfil(perfilador, carpeta, origen, destino):
+    """
+    Escribe el perfil en formato pstats (.prof): se lee con 'python -m pstats',
+    snakeviz, o se convierte en flamegraph con flameprof/gprof2dot.
+    """
+    perfilador.disable()
+    os.makedirs(carpeta, exist_ok=True)
+    nombre_archivo = os.path.join(carpeta, f"ruta_{origen}_a_{destino}_{time.time_ns()}.prof")
+    perfilador.dump_stats(nombre_archivo)
+    return nombre_archivo
+
+def _medir_peticion(calcular, status_callback, perfil, origen, destino):
+    """
+    Ejecuta calcular(medidor) midiendo sus fases (y con cProfile si perfil=CARPETA).
+    Un error se devuelve como {"error": ...}; en ambos casos el resultado trae
+    "metricas" y estas se informan en una línea por status_callback.
+    """
+    medidor = MedidorDeFases()
+    perfilador = _iniciar_perfil(perfil)
+    try:
+        # Se copia: el dict devuelto puede ser el mismo que quedó guardado en la cache
+        resultado = dict(calcular(medidor))
     except Exception as e:
-        return {"error": str(e)}
+        resultado = {"error": str(e)}
+    finally:
+        if perfilador is not None:
+            medidor.datos["perfil"] = _guardar_perfil(perfilador, perfil, origen, destino)
+    resultado["metricas"] = medidor.resumen()
+    status_callback(describir_metricas(resultado["metricas"]))
+    return resultado
 
-def crear_mapa_visual(G, ruta, origen, destino, ciudades):
-    """Crea el mapa Folium con la visualización mejorada de la ruta."""
-    mapa_centro = (G.nodes[ruta[len(ruta)//2]]['y'], G.nodes[ruta[len(ruta)//2]]['x'])
-    mapa = folium.Map(location=mapa_centro, zoom_start=12, tiles="CartoDB positron")
+def generar_datos_de_ruta(origen_nombre, destino_nombre, ciudades_interes, status_callback,
+                          almacen=ALMACEN_SAN_ROMAN, generar_mapa=True, abrir_navegador=True, cache=CACHE_DE_RUTAS,
+                          peso='length', perfil=None):
+    """
+    Motor del proyecto. Obtiene la red vial (descargada una sola vez) y calcula la ruta.
+    peso='length' busca la ruta más corta y peso='travel_time' la más rápida.
+    Con generar_mapa=False no se crea el HTML ni se abre el navegador; el resultado
+    trae la geometría como polyline codificada para dibujar el mapa después.
+    Si la ruta ya está en la cache se devuelve sin recalcular ni volver a dibujar el mapa.
+    El resultado (también el de error) trae "metricas": tiempo de reloj y de CPU
+    de cada fase, tamaño del grafo, tramos de la ruta y uso de la cache; al
+    terminar se informan en una línea por status_callback. Con perfil=CARPETA
+    se guarda además un perfil cProfile de la petición en esa carpeta.
+    Esta versión es 100% compatible con versiones antiguas de OSMnx.
+    """
+    return _medir_peticion(lambda medidor: _calcular_ruta(origen_nombre, destino_nombre, ciudades_interes,
+                                                          status_callback, almacen, generar_mapa, abrir_navegador,
+                                                          cache, peso, medidor),
+                           status_callback, perfil, origen_nombre, destino_nombre)
+
+def _calcular_ruta(origen_nombre, destino_nombre, ciudades_interes, status_callback,
+                   almacen, generar_mapa, abrir_navegador, cache, peso, medidor):
+    if peso not in PESOS_DE_RUTA:
+        raise ValueError(f"Peso de ruta desconocido: {peso}. Use uno de {', '.join(PESOS_DE_RUTA)}.")
+    with medidor.fase("carga"):
+        G = almacen.obtener(status_callback)
+        medidor.datos["nodos"], medidor.datos["aristas"] = almacen.tamano()
+
+    clave = None
+    medidor.datos["cache"] = "desactivada"
+    if cache is not None:
+        with medidor.fase("cache"):
+            clave = CacheDeRutas.clave(origen_nombre, destino_nombre, ciudades_interes, peso, almacen.version)
+            guardado, medidor.datos["cache"] = cache.obtener_con_origen(clave)
+        if guardado is not None:
+            resultado = dict(guardado["resultado"])
+            medidor.datos["tramos"] = len(guardado["ruta"]) - 1
+            if generar_mapa:
+                if not (resultado.get("mapa") and os.path.exists(resultado["mapa"])):
+                    with medidor.fase("mapa"):
+                        _, resultado["mapa"] = crear_mapa_visual(G, guardado["ruta"], origen_nombre, destino_nombre,
+                                                                 ciudades_interes, peso=peso)
+                    cache.guardar(clave, resultado, guardado["ruta"])
+                if abrir_navegador:
+                    webbrowser.open('file://' + os.path.realpath(resultado["mapa"]))
+            resultado["status"] = "¡Cálculo completado! (desde cache)"
+            return resultado
+
+    status_callback("Red lista. Buscando nodos...")
+
+    with medidor.fase("ubicacion"):
+        nodos = almacen.nodos_de_ciudades(ciudades_interes, [origen_nombre, destino_nombre])
+    nodo_origen, nodo_destino = nodos[origen_nombre], nodos[destino_nombre]
+    status_callback("Nodos encontrados. Calculando ruta...")
+
+    # Si se preparó un motor ALT para este grafo se usa; si no, Dijkstra de networkx
+    with medidor.fase("ruta"):
+        motor = almacen.obtener_motor(peso)
+        if motor is not None:
+            ruta = motor.ruta_mas_corta(nodo_origen, nodo_destino)
+        else:
+            ruta = nx.shortest_path(G, source=nodo_origen, target=nodo_destino, weight=peso)
+    medidor.datos["motor"] = "alt" if motor is not None else "dijkstra"
+    medidor.datos["tramos"] = len(ruta) - 1
+    status_callback("Ruta calculada. Procesando detalles del viaje...")
+
+    with medidor.fase("resumen"):
+        resultado, geometria = _resumen_de_ruta(G, almacen.obtener_tabla(), ruta, peso)
+
+    if generar_mapa:
+        status_callback("Detalles procesados. Generando mapa...")
+        with medidor.fase("mapa"):
+            _, resultado["mapa"] = dibujar_mapa(geometria, origen_nombre, destino_nombre, ciudades_interes,
+                                                   nombre_archivo=nombre_de_mapa(origen_nombre, destino_nombre, peso))
+        if abrir_navegador:
+            webbrowser.open('file://' + os.path.realpath(resultado["mapa"]))
+
+    resultado["status"] = "¡Cálculo completado!"
+    if cache is not None:
+        cache.guardar(clave, resultado, ruta)
+    return resultado
+
+def _resumen_de_ruta(G, tabla, ruta, peso):
+    """
+    Distancia, tiempo y calles de una ruta (operaciones vectorizadas sobre la tabla
+    de aristas) y su geometría compacta: simplificada al detalle de zoom 16 y
+    codificada como polyline. Devuelve (resultado, geometria); el resultado aún
+    no tiene mapa ("mapa": None) y la geometría sirve para dibujarlo.
+    """
+    distancia_total_m, tiempo_estimado_horas, lista_de_calles = tabla.resumir_ruta(ruta, peso)
+    if not lista_de_calles:
+        lista_de_calles = ["Rutas sin nombre definido"]
+    distancia_km = distancia_total_m / 1000
+    # Un solo redondeo: el texto son los mismos minutos que "tiempo_min", redondeados al entero
+    tiempo_min = round(tiempo_estimado_horas * 60, 1)
+
+    puntos_ruta = [(G.nodes[nodo]['y'], G.nodes[nodo]['x']) for nodo in ruta]
+    geometria = simplificar_linea(puntos_ruta, tolerancia_para_zoom(16, puntos_ruta[0][0]))
+    resultado = {
+        "distancia": f"{distancia_km:.2f} km",
+        "tiempo": f"{math.floor(tiempo_min + 0.5)} minutos",
+        "calles": lista_de_calles,
+        "distancia_km": round(distancia_km, 3),
+        "tiempo_min": tiempo_min,
+        "mapa": None,
+        "peso": peso,
+        "polyline": codificar_polyline(geometria),
+        "limites": limites_de(geometria),
+    }
+    return resultado, geometria
+
+def tolerancia_para_zoom(zoom, latitud):
+    """Metros que ocupa un píxel en ese nivel de zoom: por debajo de eso no se notan los detalles."""
+    return 156543.03 * math.cos(math.radians(latitud)) / (2 ** zoom)
+
+def simplificar_linea(puntos, tolerancia_m):
+    """
+    Simplifica una lista de (lat, lon) con Douglas-Peucker: descarta los puntos
+    que se apartan menos de tolerancia_m del segmento que los rodea.
+    """
+    if len(puntos) < 3 or tolerancia_m <= 0:
+        return [tuple(p) for p in puntos]
+    coordenadas = np.asarray(puntos, dtype=np.float64)
+    # Proyección local en metros (suficiente para una provincia)
+    lat0 = math.radians(float(coordenadas[:, 0].mean()))
+    xy = np.column_stack((coordenadas[:, 1] * 111320 * math.cos(lat0), coordenadas[:, 0] * 110574))
+
+    conservar = np.zeros(len(xy), dtype=bool)
+    conservar[0] = conservar[-1] = True
+    pendientes = [(0, len(xy) - 1)]
+    while pendientes:
+        i, j = pendientes.pop()
+        if j <= i + 1:
+            continue
+        a, b = xy[i], xy[j]
+        intermedios = xy[i + 1:j]
+        ab = b - a
+        largo2 = float(ab @ ab)
+        if largo2 == 0:
+            cercanos = np.broadcast_to(a, intermedios.shape)
+        else:
+            t = np.clip((intermedios - a) @ ab / largo2, 0, 1)
+            cercanos = a + t[:, None] * ab
+        distancias = np.hypot(*(intermedios - cercanos).T)
+        k = int(np.argmax(distancias))
+        if distancias[k] > tolerancia_m:
+            medio = i + 1 + k
+            conservar[medio] = True
+            pendientes.append((i, medio))
+            pendientes.append((medio, j))
+    return [tuple(p) for p in coordenadas[conservar].tolist()]
+
+def limites_de(puntos):
+    """Devuelve [[lat_min, lon_min], [lat_max, lon_max]] directamente de las coordenadas."""
+    latitudes = [p[0] for p in puntos]
+    longitudes = [p[1] for p in puntos]
+    return [[min(latitudes), min(longitudes)], [max(latitudes), max(longitudes)]]
+
+def codificar_polyline(puntos, precision=5):
+    """Codifica (lat, lon) con el algoritmo 'Encoded Polyline' de Google (texto compacto)."""
+    factor = 10 ** precision
+    partes = []
+    anterior_lat = anterior_lon = 0
+    for lat, lon in puntos:
+        lat_entero, lon_entero = int(round(lat * factor)), int(round(lon * factor))
+        for delta in (lat_entero - anterior_lat, lon_entero - anterior_lon):
+            valor = ~(delta << 1) if delta < 0 else delta << 1
+            while valor >= 0x20:
+                partes.append(chr((0x20 | (valor & 0x1f)) + 63))
+                valor >>= 5
+            partes.append(chr(valor + 63))
+        anterior_lat, anterior_lon = lat_entero, lon_entero
+    return "".join(partes)
+
+def decodificar_polyline(texto, precision=5):
+    """Operación inversa de codificar_polyline."""
+    factor = 10 ** precision
+    puntos = []
+    indice = lat = lon = 0
+    while indice < len(texto):
+        deltas = []
+        for _ in range(2):
+            resultado = desplazamiento = 0
+            while True:
+                byte = ord(texto[indice]) - 63
+                indice += 1
+                resultado |= (byte & 0x1f) << desplazamiento
+                desplazamiento += 5
+                if byte < 0x20:
+                    break
+            deltas.append(~(resultado >> 1) if resultado & 1 else resultado >> 1)
+        lat += deltas[0]
+        lon += deltas[1]
+        puntos.append((lat / factor, lon / factor))
+    return puntos
+
+def exportar_geometria(puntos, nombre_archivo, propiedades=None):
+    """Guarda la ruta como GeoJSON (.geojson/.json) o como polyline codificada (cualquier otra extensión)."""
+    if nombre_archivo.lower().endswith(('.geojson', '.json')):
+        entidad = {
+            "type": "Feature",
+            "geometry": {"type": "LineString", "coordinates": [[lon, lat] for lat, lon in puntos]},
+            "properties": propiedades or {},
+        }
+        with open(nombre_archivo, 'w', encoding='utf-8') as archivo:
+            json.dump(entidad, archivo, ensure_ascii=False)
+    else:
+        with open(nombre_archivo, 'w', encoding='utf-8') as archivo:
+            archivo.write(codificar_polyline(puntos))
+    return nombre_archivo
+
+def nombre_de_mapa(origen, destino, peso='length'):
+    """
+    Archivo HTML del mapa de una ruta. Cada peso tiene el suyo, para que la
+    ruta más rápida no pise a la más corta (la cache reutiliza el archivo).
+    """
+    sufijo = "" if peso == 'length' else f"_{peso}"
+    return f"ruta_{origen}_a_{destino}{sufijo}.html"
+
+def dibujar_mapa(puntos_ruta, origen, destino, ciudades, zoom=12, nombre_archivo=None):
+    """
+    Crea el mapa Folium a partir de las coordenadas de la ruta. La línea se
+    simplifica para el zoom elegido y los límites se calculan de los puntos.
+    """
+    tolerancia = tolerancia_para_zoom(zoom, puntos_ruta[len(puntos_ruta)//2][0])
+    puntos_ruta = simplificar_linea(puntos_ruta, tolerancia)
+    mapa = folium.Map(location=puntos_ruta[len(puntos_ruta)//2], zoom_start=zoom, tiles="CartoDB positron")
 
-    puntos_ruta = [(G.nodes[node]['y'], G.nodes[node]['x']) for node in ruta]
-    
     folium.PolyLine(puntos_ruta, color='black', weight=8, opacity=0.8).add_to(mapa)
     folium.PolyLine(puntos_ruta, color='#FF4500', weight=5, opacity=1).add_to(mapa)
 
@@ -90,22 +1082,343 @@ def crear_mapa_visual(G, ruta, origen, destino, ciudades):
         if ciudad == origen: icono = folium.Icon(color='green', icon='play', prefix='fa')
         if ciudad == destino: icono = folium.Icon(color='red', icon='flag-checkered', prefix='fa')
         folium.Marker(location=data['pos'], popup=f"<b>{ciudad}</b>", tooltip=ciudad, icon=icono).add_to(mapa)
-    
-    mapa.fit_bounds(folium.PolyLine(puntos_ruta).get_bounds(), padding=(15, 15))
-    
-    nombre_archivo = f"ruta_{origen}_a_{destino}.html"
+
+    mapa.fit_bounds(limites_de(puntos_ruta), padding=(15, 15))
+
+    nombre_archivo = nombre_archivo or nombre_de_mapa(origen, destino)
     mapa.save(nombre_archivo)
     return mapa, nombre_archivo
 
+def crear_mapa_visual(G, ruta, origen, destino, ciudades, zoom=12, peso='length'):
+    """Crea el mapa Folium con la visualización mejorada de la ruta."""
+    puntos_ruta = [(G.nodes[node]['y'], G.nodes[node]['x']) for node in ruta]
+    return dibujar_mapa(puntos_ruta, origen, destino, ciudades, zoom, nombre_de_mapa(origen, destino, peso))
+
+# --- Matriz de rutas entre todas las ciudades (modo por lotes) ---
+
+_GRAFO_DEL_PROCESO = None
+_TABLA_DEL_PROCESO = None
+
+def _iniciar_proceso_de_matriz(G, tabla):
+    """Cada proceso del pool recibe el grafo y la tabla de aristas una sola vez."""
+    global _GRAFO_DEL_PROCESO, _TABLA_DEL_PROCESO
+    _GRAFO_DEL_PROCESO = G
+    _TABLA_DEL_PROCESO = tabla
+
+def _arbol_desde_origen(nodo_origen, nodos_destino, incluir_rutas, peso='length', G=None, tabla=None):
+    """
+    Ejecuta un solo Dijkstra desde el origen y devuelve (metros, segundos, ruta)
+    hacia cada nodo destino. Solo se reconstruyen las rutas de los destinos;
+    los inalcanzables quedan como (None, None, None).
+    """
+    G = G if G is not None else _GRAFO_DEL_PROCESO
+    tabla = tabla if tabla is not None else _TABLA_DEL_PROCESO
+    previos, _ = nx.dijkstra_predecessor_and_distance(G, nodo_origen, weight=peso)
+    filas = []
+    for destino in nodos_destino:
+        if destino not in previos:
+            filas.append((None, None, None))
+            continue
+        ruta = [destino]
+        while previos[ruta[-1]]:
+            ruta.append(previos[ruta[-1]][0])
+        ruta.reverse()
+        metros, horas, _ = tabla.resumir_ruta(ruta, peso)
+        filas.append((metros, horas * 3600, ruta if incluir_rutas else None))
+    return filas
+
+def calcular_matriz_de_rutas(ciudades_interes, almacen=ALMACEN_SAN_ROMAN, incluir_rutas=False, procesos=None,
+                             status_callback=print, peso='length'):
+    """
+    Calcula distancia y tiempo entre todos los pares de ciudades.
+    Las ciudades se ubican en el grafo con el índice espacial y se ejecuta
+    un único árbol de Dijkstra por origen (N búsquedas en lugar de N² consultas).
+    Con procesos > 1 los orígenes se reparten en un pool de procesos.
+    """
+    G = almacen.obtener(status_callback)
+    tabla = almacen.obtener_tabla()
+    nombres = list(ciudades_interes)
+    status_callback(f"Ubicando {len(nombres)} ciudades en la red...")
+    nodos_por_ciudad = almacen.nodos_de_ciudades(ciudades_interes, nombres)
+    nodos = [nodos_por_ciudad[n] for n in nombres]
+
+    status_callback(f"Calculando {len(nombres)} árboles de rutas...")
+    if procesos and procesos > 1:
+        with ProcessPoolExecutor(max_workers=procesos, initializer=_iniciar_proceso_de_matriz, initargs=(G, tabla)) as pool:
+            futuros = [pool.submit(_arbol_desde_origen, nodo, nodos, incluir_rutas, peso) for nodo in nodos]
+            filas = [futuro.result() for futuro in futuros]
+    else:
+        filas = [_arbol_desde_origen(nodo, nodos, incluir_rutas, peso, G, tabla) for nodo in nodos]
+
+    distancias_km, tiempos_min, rutas = [], [], {}
+    for origen, fila in zip(nombres, filas):
+        fila_km, fila_min = [], []
+        for destino, (metros, segundos, ruta) in zip(nombres, fila):
+            if metros is None:
+                fila_km.append(None)
+                fila_min.append(None)
+                continue
+            fila_km.append(round(metros / 1000, 3))
+            fila_min.append(round(segundos / 60, 1))
+            if incluir_rutas and origen != destino:
+                rutas[f"{origen}->{destino}"] = ruta
+        distancias_km.append(fila_km)
+        tiempos_min.append(fila_min)
+
+    status_callback("¡Matriz de rutas completada!")
+    return {
+        "ciudades": nombres,
+        "peso": peso,
+        "nodos": dict(zip(nombres, nodos)),
+        "distancias_km": distancias_km,
+        "tiempos_min": tiempos_min,
+        "rutas": rutas if incluir_rutas else None,
+    }
+
+def exportar_matriz(matriz, nombre_archivo):
+    """Guarda la matriz en CSV (una fila por par origen/destino) o en JSON, según la extensión."""
+    if nombre_archivo.lower().endswith('.json'):
+        with open(nombre_archivo, 'w', encoding='utf-8') as archivo:
+            json.dump(matriz, archivo, ensure_ascii=False, indent=2)
+        return nombre_archivo
+
+    with open(nombre_archivo, 'w', newline='', encoding='utf-8') as archivo:
+        escritor = csv.writer(archivo)
+        escritor.writerow(["origen", "destino", "distancia_km", "tiempo_min"])
+        nombres = matriz["ciudades"]
+        for i, origen in enumerate(nombres):
+            for j, destino in enumerate(nombres):
+                if i != j:
+                    escritor.writerow([origen, destino, matriz["distancias_km"][i][j], matriz["tiempos_min"][i][j]])
+    return nombre_archivo
+
+# --- Recorrido con varias paradas (orden de visita óptimo) ---
+
+MAX_PARADAS_EXACTO = 12  # Hasta aquí se usa programación dinámica; con más, heurística
+
+def _costo_de_orden(costos, orden, regresar):
+    total = sum(costos[a][b] for a, b in zip(orden, orden[1:]))
+    return total + costos[orden[-1]][orden[0]] if regresar else total
+
+def _orden_exacto(costos, regresar=False, final=None):
+    """
+    Orden óptimo de visita (Held-Karp, O(2^k · k²)) empezando en la parada 0.
+    Con regresar=True se vuelve a la parada 0; con 'final' esa parada va última.
+    Los costos pueden ser asimétricos (calles de un solo sentido).
+    """
+    k = len(costos)
+    resto = k - 1  # Paradas 1..k-1 como bits 0..k-2
+    completo = (1 << resto) - 1
+    mejor = [[math.inf] * k for _ in range(completo + 1)]
+    previo = [[None] * k for _ in range(completo + 1)]
+    for j in range(1, k):
+        mejor[1 << (j - 1)][j] = costos[0][j]
+    for visitadas in range(1, completo + 1):
+        for j in range(1, k):
+            costo = mejor[visitadas][j]
+            if costo == math.inf or (j == final and visitadas != completo):
+                continue
+            for siguiente in range(1, k):
+                bit = 1 << (siguiente - 1)
+                if visitadas & bit:
+                    continue
+                nuevo = costo + costos[j][siguiente]
+                if nuevo < mejor[visitadas | bit][siguiente]:
+                    mejor[visitadas | bit][siguiente] = nuevo
+                    previo[visitadas | bit][siguiente] = j
+
+    candidatas = [final] if final is not None else range(1, k)
+    ultima = min(candidatas, key=lambda j: mejor[completo][j] + (costos[j][0] if regresar else 0))
+    if mejor[completo][ultima] == math.inf:
+        return list(range(k))  # Ningún orden conecta todas las paradas
+    orden, visitadas = [], completo
+    while ultima is not None and ultima != 0:
+        orden.append(ultima)
+        visitadas, ultima = visitadas & ~(1 << (ultima - 1)), previo[visitadas][ultima]
+    return [0] + orden[::-1]
+
+def _orden_heuristico(costos, regresar=False, final=None):
+    """
+    Vecino más cercano desde la parada 0 y luego mejoras locales hasta que
+    ninguna acorte el recorrido: 2-opt (invertir un tramo) y Or-opt (mover
+    1 a 3 paradas seguidas a otra posición). La primera parada y, si se
+    fijó, la última no se mueven. Cada movimiento se evalúa por la diferencia
+    de costo que produce, sin armar el orden candidato.
+    """
+    k = len(costos)
+    # Un tramo imposible cuesta más que cualquier recorrido posible, así las diferencias
+    # siguen siendo números finitos
+    castigo = 1 + k * max((c for fila in costos for c in fila if c != math.inf), default=0)
+    # La parada ficticia k cierra el orden: desde ella no cuesta nada y llegar a ella
+    # cuesta el regreso al inicio (o nada si no se regresa)
+    costos = [[castigo if c == math.inf else c for c in fila] for fila in costos]
+    for fila in costos:
+        fila.append(fila[0] if regresar else 0)
+    costos.append([0] * (k + 1))
+    tolerancia = 1e-9 * castigo
+
+    pendientes = set(range(1, k)) - {final}
+    orden = [0]
+    while pendientes:
+        siguiente = min(pendientes, key=lambda j: costos[orden[-1]][j])
+        orden.append(siguiente)
+        pendientes.remove(siguiente)
+    if final is not None:
+        orden.append(final)
+    orden.append(k)
+    movibles = k - (1 if final is not None else 0)  # orden[1:movibles] se puede reordenar
+
+    mejoro = True
+    while mejoro:
+        mejoro = False
+        # 2-opt: invertir orden[i:j]. Con costos asimétricos el tramo invertido se recorre
+        # al revés, por eso se guardan sumas acumuladas en ambos sentidos.
+        adelante, atras = _sumas_acumuladas(costos, orden)
+        for i in range(1, movibles - 1):
+            for j in range(i + 2, movibles + 1):
+                a, b, c, d = orden[i - 1], orden[i], orden[j - 1], orden[j]
+                delta = (costos[a][c] + atras[j - 1] - atras[i] + costos[b][d]
+                         - costos[a][b] - adelante[j - 1] + adelante[i] - costos[c][d])
+                if delta < -tolerancia:
+                    orden[i:j] = orden[i:j][::-1]
+                    adelante, atras = _sumas_acumuladas(costos, orden)
+                    mejoro = True
+        # Or-opt: sacar orden[i:f] y meterlo entre orden[p - 1] y orden[p]
+        for largo in (1, 2, 3):
+            for i in range(1, movibles - largo + 1):
+                f = i + largo
+                antes, primera, ultima, despues = orden[i - 1], orden[i], orden[f - 1], orden[f]
+                quitar = costos[antes][despues] - costos[antes][primera] - costos[ultima][despues]
+                for p in chain(range(1, i), range(f + 1, movibles + 1)):
+                    a, b = orden[p - 1], orden[p]
+                    if quitar + costos[a][primera] + costos[ultima][b] - costos[a][b] < -tolerancia:
+                        tramo = orden[i:f]
+                        if p < i:
+                            orden[p:f] = tramo + orden[p:i]
+                        else:
+                            orden[i:p] = orden[f:p] + tramo
+                        mejoro = True
+                        break
+    return orden[:-1]
+
+def _sumas_acumuladas(costos, orden):
+    """Costo acumulado de orden[0..t] recorrido hacia adelante y de cada tramo recorrido al revés."""
+    adelante, atras = [0], [0]
+    for a, b in zip(orden, orden[1:]):
+        adelante.append(adelante[-1] + costos[a][b])
+        atras.append(atras[-1] + costos[b][a])
+    return adelante, atras
+
+def generar_datos_de_recorrido(paradas, ciudades_interes, status_callback, almacen=ALMACEN_SAN_ROMAN,
+                               regresar=False, fijar_destino=False, generar_mapa=True, abrir_navegador=True,
+                               peso='length', perfil=None):
+    """
+    Recorrido que visita varias ciudades en el mejor orden. La primera parada es
+    el punto de partida; con fijar_destino=True la última también queda fija y
+    con regresar=True se vuelve al inicio. Se ejecuta un árbol de Dijkstra por
+    parada (como en la matriz de rutas) y el orden se resuelve de forma exacta
+    hasta MAX_PARADAS_EXACTO paradas, o con heurística si son más. Devuelve el
+    mismo resumen que generar_datos_de_ruta más "orden", "tramos" y "metodo".
+    """
+    return _medir_peticion(lambda medidor: _calcular_recorrido(paradas, ciudades_interes, status_callback, almacen,
+                                                               regresar, fijar_destino, generar_mapa,
+                                                               abrir_navegador, peso, medidor),
+                           status_callback, perfil, paradas[0], f"{len(paradas)}_paradas")
+
+def _calcular_recorrido(paradas, ciudades_interes, status_callback, almacen, regresar, fijar_destino,
+                        generar_mapa, abrir_navegador, peso, medidor):
+    if peso not in PESOS_DE_RUTA:
+        raise ValueError(f"Peso de ruta desconocido: {peso}. Use uno de {', '.join(PESOS_DE_RUTA)}.")
+    paradas = list(dict.fromkeys(paradas))  # Sin repetidas, en el orden dado
+    desconocidas = [p for p in paradas if p not in ciudades_interes]
+    if desconocidas:
+        raise ValueError(f"Ciudad desconocida: {desconocidas[0]}")
+    if len(paradas) < 2:
+        raise ValueError("Se necesitan al menos dos paradas distintas.")
+
+    with medidor.fase("carga"):
+        G = almacen.obtener(status_callback)
+        tabla = almacen.obtener_tabla()
+        medidor.datos["nodos"], medidor.datos["aristas"] = almacen.tamano()
+    with medidor.fase("ubicacion"):
+        nodos_por_ciudad = almacen.nodos_de_ciudades(ciudades_interes, paradas)
+    nodos = [nodos_por_ciudad[p] for p in paradas]
+
+    status_callback(f"Calculando {len(paradas)} árboles de rutas...")
+    with medidor.fase("matriz"):
+        filas = [_arbol_desde_origen(nodo, nodos, True, peso, G, tabla) for nodo in nodos]
+    indice_peso = 0 if peso == 'length' else 1
+    costos = [[math.inf if metros is None else (metros, segundos)[indice_peso] for metros, segundos, _ in fila]
+              for fila in filas]
+
+    status_callback("Buscando el mejor orden de visita...")
+    final = len(paradas) - 1 if fijar_destino and not regresar else None
+    with medidor.fase("orden"):
+        if len(paradas) <= MAX_PARADAS_EXACTO:
+            orden, metodo = _orden_exacto(costos, regresar, final), "exacto"
+        else:
+            orden, metodo = _orden_heuristico(costos, regresar, final), "heuristica"
+    if regresar:
+        orden = orden + [0]
+    if _costo_de_orden(costos, orden, False) == math.inf:
+        raise ValueError("Algunas paradas no están conectadas por la red vial.")
+
+    with medidor.fase("resumen"):
+        # Se unen las rutas de cada tramo sin repetir el nodo donde se juntan
+        ruta, tramos = [nodos[orden[0]]], []
+        for a, b in zip(orden, orden[1:]):
+            metros, segundos, tramo = filas[a][b]
+            ruta.extend(tramo[1:])
+            tramos.append({"origen": paradas[a], "destino": paradas[b],
+                           "distancia_km": round(metros / 1000, 3), "tiempo_min": round(segundos / 60, 1)})
+        resumen, geometria = _resumen_de_ruta(G, tabla, ruta, peso)
+    medidor.datos["tramos"] = len(ruta) - 1
+
+    visitadas = [paradas[i] for i in orden]
+    resultado = {"orden": visitadas, "tramos": tramos, "metodo": metodo, **resumen}
+    if generar_mapa:
+        status_callback("Recorrido calculado. Generando mapa...")
+        with medidor.fase("mapa"):
+            solo_paradas = {p: ciudades_interes[p] for p in paradas}
+            nombre = "_".join(visitadas[:2] + ["etc"] if len(visitadas) > 3 else visitadas)
+            _, resultado["mapa"] = dibujar_mapa(geometria, visitadas[0], visitadas[-1], solo_paradas,
+                                                nombre_archivo=f"recorrido_{nombre}.html")
+        if abrir_navegador:
+            webbrowser.open('file://' + os.path.realpath(resultado["mapa"]))
+
+    resultado["status"] = "¡Recorrido completado!"
+    return resultado
+
 # --- 2. INTERFAZ GRÁFICA DE USUARIO (GUI con Tkinter) ---
-# (Esta parte no necesita cambios)
+
+def _importar_tkinter():
+    """
+    tkinter se importa (como global del módulo) recién al abrir la interfaz, así los
+    modos sin interfaz (--ruta, --matriz, --servidor...) funcionan aunque falte _tkinter.
+    """
+    global tk, ttk, messagebox, scrolledtext
+    import tkinter as tk
+    from tkinter import ttk, messagebox, scrolledtext
+
+def lanzar_interfaz(ciudades, perfil=None, almacen=ALMACEN_SAN_ROMAN):
+    """Abre la ventana de la aplicación y espera a que se cierre."""
+    _importar_tkinter()
+    root = tk.Tk()
+    app = App(root, ciudades, perfil=perfil, almacen=almacen)
+    root.mainloop()
+    return app
 
 class App:
-    def __init__(self, root, ciudades):
+    def __init__(self, root, ciudades, perfil=None, almacen=ALMACEN_SAN_ROMAN):
+        _importar_tkinter()
         self.root = root
         self.ciudades = ciudades
+        self.almacen = almacen
+        self.perfil = perfil  # Carpeta para los perfiles cProfile de cada cálculo (opcional)
+        # Un solo hilo de trabajo reutilizable en lugar de un Thread nuevo por clic
+        self.pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="calculo")
         self.root.title("Sistema de Navegación - San Román")
-        self.root.geometry("450x400")
+        self.root.geometry("450x440")
         style = ttk.Style()
         style.theme_use('clam')
         main_frame = ttk.Frame(root, padding="15")
@@ -121,10 +1434,21 @@ class App:
         self.destino_combo = ttk.Combobox(selection_frame, values=sorted(list(self.ciudades.keys())), state="readonly")
         self.destino_combo.grid(row=1, column=1, sticky=tk.EW, padx=5, pady=5)
         self.destino_combo.set("Lampa")
+        ttk.Label(selection_frame, text="Criterio:").grid(row=2, column=0, sticky=tk.W, padx=5, pady=5)
+        self.criterios = {"Ruta más corta": 'length', "Ruta más rápida": 'travel_time'}
+        self.criterio_combo = ttk.Combobox(selection_frame, values=list(self.criterios), state="readonly")
+        self.criterio_combo.grid(row=2, column=1, sticky=tk.EW, padx=5, pady=5)
+        self.criterio_combo.set("Ruta más corta")
         selection_frame.columnconfigure(1, weight=1)
 
-        self.calculate_button = ttk.Button(main_frame, text="Generar Ruta y Mapa", command=self.iniciar_calculo_thread)
-        self.calculate_button.pack(pady=10, fill=tk.X, ipady=5)
+        botones_frame = ttk.Frame(main_frame)
+        botones_frame.pack(pady=10, fill=tk.X)
+        self.calculate_button = ttk.Button(botones_frame, text="Calcular Ruta", command=self.iniciar_calculo_thread)
+        self.calculate_button.pack(side=tk.LEFT, fill=tk.X, expand=True, ipady=5)
+        # El mapa se genera solo cuando el usuario lo pide
+        self.mapa_button = ttk.Button(botones_frame, text="Ver Mapa", command=self.iniciar_mapa_thread, state=tk.DISABLED)
+        self.mapa_button.pack(side=tk.LEFT, fill=tk.X, expand=True, ipady=5, padx=(5, 0))
+        self.ultimo_resultado = None
 
         results_frame = ttk.LabelFrame(main_frame, text="2. Resumen del Viaje", padding="10")
         results_frame.pack(fill=tk.BOTH, expand=True)
@@ -136,7 +1460,7 @@ class App:
         self.calles_text = scrolledtext.ScrolledText(results_frame, height=5, wrap=tk.WORD, state=tk.DISABLED, bg="#f0f0f0")
         self.calles_text.pack(fill=tk.BOTH, expand=True)
 
-        self.status_label = ttk.Label(root, text="Listo para calcular.", relief=tk.SUNKEN, anchor=tk.W, padding=5)
+        self.status_label = ttk.Label(root, text="Listo para calcular.", relief=tk.SUNKEN, anchor=tk.W, padding=5, wraplength=430)
         self.status_label.pack(side=tk.BOTTOM, fill=tk.X)
 
     def actualizar_status(self, mensaje):
@@ -150,21 +1474,40 @@ class App:
             messagebox.showwarning("Selección inválida", "El origen y destino deben ser diferentes.")
             return
         self.calculate_button.config(state=tk.DISABLED)
+        self.mapa_button.config(state=tk.DISABLED)
         self.actualizar_status("Iniciando cálculo...")
         self.distancia_label.config(text="Distancia: --")
         self.tiempo_label.config(text="Tiempo Estimado: --")
         self.calles_text.config(state=tk.NORMAL); self.calles_text.delete('1.0', tk.END); self.calles_text.config(state=tk.DISABLED)
-        thread = Thread(target=self.ejecutar_logica_en_background, args=(origen, destino))
-        thread.start()
+        self.pool.submit(self.ejecutar_logica_en_background, origen, destino, self.criterios[self.criterio_combo.get()])
         
-    def ejecutar_logica_en_background(self, origen, destino):
-        resultados = generar_datos_de_ruta(origen, destino, self.ciudades, self.actualizar_status)
-        self.root.after(0, self.finalizar_calculo, resultados)
+    def ejecutar_logica_en_background(self, origen, destino, peso):
+        resultados = generar_datos_de_ruta(origen, destino, self.ciudades, self.actualizar_status, almacen=self.almacen,
+                                           generar_mapa=False, peso=peso, perfil=self.perfil)
+        self.root.after(0, self.finalizar_calculo, origen, destino, resultados)
+
+    def iniciar_mapa_thread(self):
+        if self.ultimo_resultado is None:
+            return
+        self.mapa_button.config(state=tk.DISABLED)
+        self.actualizar_status("Generando mapa...")
+        self.pool.submit(self.abrir_mapa_en_background, *self.ultimo_resultado)
+
+    def abrir_mapa_en_background(self, origen, destino, resultados):
+        try:
+            _, nombre_archivo = dibujar_mapa(decodificar_polyline(resultados['polyline']), origen, destino, self.ciudades,
+                                             nombre_archivo=nombre_de_mapa(origen, destino, resultados['peso']))
+            webbrowser.open('file://' + os.path.realpath(nombre_archivo))
+            mensaje = f"Mapa guardado en {nombre_archivo}"
+        except Exception as e:
+            mensaje = f"Error al generar el mapa: {e}"
+        self.root.after(0, self.actualizar_status, mensaje)
+        self.root.after(0, lambda: self.mapa_button.config(state=tk.NORMAL))
 
-    def finalizar_calculo(self, resultados):
+    def finalizar_calculo(self, origen, destino, resultados):
         if "error" in resultados:
             messagebox.showerror("Error", resultados["error"])
-            self.actualizar_status("Error en el cálculo.")
+            self.actualizar_status(f"Error en el cálculo.\n{describir_metricas(resultados['metricas'])}")
         else:
             self.distancia_label.config(text=f"Distancia: {resultados['distancia']}")
             self.tiempo_label.config(text=f"Tiempo Estimado: {resultados['tiempo']}")
@@ -172,17 +1515,183 @@ class App:
             self.calles_text.delete('1.0', tk.END)
             self.calles_text.insert(tk.END, "\n".join(f"• {calle}" for calle in resultados['calles']))
             self.calles_text.config(state=tk.DISABLED)
-            self.actualizar_status(resultados['status'])
+            # Tiempos por fase, tamaño del grafo y uso de la cache en la barra de estado
+            self.actualizar_status(f"{resultados['status']}\n{describir_metricas(resultados['metricas'])}")
+            # Las ciudades de la petición: los combos pueden haber cambiado durante el cálculo
+            self.ultimo_resultado = (origen, destino, resultados)
+            self.mapa_button.config(state=tk.NORMAL)
         self.calculate_button.config(state=tk.NORMAL)
 
-# --- 3. CONFIGURACIÓN Y EJECUCIÓN ---
+# --- 3. SERVICIO SIN INTERFAZ (HTTP/JSON) ---
+
+class ManejadorDeRutas(BaseHTTPRequestHandler):
+    """
+    Atiende GET /ruta?origen=Juliaca&destino=Lampa[&peso=travel_time],
+    GET /recorrido?paradas=Juliaca,Lampa,Pusi[&peso=...&regresar=1&fijar_destino=1],
+    GET /ciudades y GET /salud.
+    Responde siempre en JSON y nunca genera mapas ni abre el navegador.
+    """
+    def _responder(self, codigo, datos):
+        cuerpo = json.dumps(datos, ensure_ascii=False).encode('utf-8')
+        self.send_response(codigo)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parametros = {clave: valores[0] for clave, valores in parse_qs(url.query).items()}
+        ciudades = self.server.ciudades
+
+        if url.path == "/salud":
+            self._responder(200, {"estado": "ok", "grafo": self.server.almacen.version,
+                                  "cache": CACHE_DE_RUTAS.estadisticas()})
+        elif url.path == "/ciudades":
+            self._responder(200, {"ciudades": sorted(ciudades)})
+        elif url.path == "/ruta":
+            origen, destino = parametros.get("origen"), parametros.get("destino")
+            desconocidas = [c for c in (origen, destino) if c not in ciudades]
+            if desconocidas:
+                self._responder(400, {"error": f"Ciudad desconocida: {desconocidas[0]}"})
+                return
+            peso = parametros.get("peso", 'length')
+            if peso not in PESOS_DE_RUTA:
+                self._responder(400, {"error": f"Peso desconocido: {peso}"})
+                return
+            resultado = generar_datos_de_ruta(origen, destino, ciudades, lambda mensaje: None,
+                                              almacen=self.server.almacen, generar_mapa=False, peso=peso,
+                                              perfil=self.server.perfil)
+            self._responder(500 if "error" in resultado else 200, resultado)
+        elif url.path == "/recorrido":
+            paradas = [p.strip() for p in parametros.get("paradas", "").split(",") if p.strip()]
+            desconocidas = [c for c in paradas if c not in ciudades]
+            if desconocidas:
+                self._responder(400, {"error": f"Ciudad desconocida: {desconocidas[0]}"})
+                return
+            if len(set(paradas)) < 2:
+                self._responder(400, {"error": "Se necesitan al menos dos paradas distintas."})
+                return
+            peso = parametros.get("peso", 'length')
+            if peso not in PESOS_DE_RUTA:
+                self._responder(400, {"error": f"Peso desconocido: {peso}"})
+                return
+            resultado = generar_datos_de_recorrido(paradas, ciudades, lambda mensaje: None,
+                                                   almacen=self.server.almacen,
+                                                   regresar=parametros.get("regresar") == "1",
+                                                   fijar_destino=parametros.get("fijar_destino") == "1",
+                                                   generar_mapa=False, peso=peso, perfil=self.server.perfil)
+            self._responder(500 if "error" in resultado else 200, resultado)
+        else:
+            self._responder(404, {"error": f"Ruta no encontrada: {url.path}"})
+
+    def log_message(self, formato, *args):
+        if self.server.verboso:
+            super().log_message(formato, *args)
+
+class ServidorDeRutas(HTTPServer):
+    """
+    Servidor HTTP que atiende cada petición en un pool de hilos de tamaño fijo.
+    Todos los hilos comparten el mismo grafo ya cargado en el almacén.
+    """
+    def __init__(self, direccion, ciudades, almacen=ALMACEN_SAN_ROMAN, max_concurrencia=4, verboso=False, perfil=None):
+        super().__init__(direccion, ManejadorDeRutas)
+        self.ciudades = ciudades
+        self.almacen = almacen
+        self.verboso = verboso
+        self.perfil = perfil
+        self.pool = ThreadPoolExecutor(max_workers=max_concurrencia, thread_name_prefix="ruta")
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._procesar_en_pool, request, client_address)
+
+    def _procesar_en_pool(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=True)
+
+def iniciar_servidor(ciudades, host="127.0.0.1", puerto=8000, max_concurrencia=4, almacen=ALMACEN_SAN_ROMAN, perfil=None):
+    """Carga el grafo una vez y atiende peticiones hasta Ctrl+C."""
+    almacen.obtener(print)
+    almacen.obtener_tabla()
+    almacen.nodos_de_ciudades(ciudades)
+    servidor = ServidorDeRutas((host, puerto), ciudades, almacen, max_concurrencia, verboso=True, perfil=perfil)
+    print(f"Servidor de rutas escuchando en http://{host}:{puerto} ({max_concurrencia} hilos)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        print("\nDeteniendo servidor...")
+    finally:
+        servidor.server_close()
+
+# --- 4. CONFIGURACIÓN Y EJECUCIÓN ---
+CIUDADES_DE_INTERES = {
+    "Juliaca": {"pos": [-15.498, -70.129]}, "Caracoto": {"pos": [-15.552, -70.081]},
+    "Cabanillas": {"pos": [-15.635, -70.354]}, "Santa Lucia": {"pos": [-15.698, -70.575]},
+    "Cabana": {"pos": [-15.333, -70.320]}, "Pusi": {"pos": [-15.367, -69.951]},
+    "Samán": {"pos": [-15.311, -70.065]}, "Lampa": {"pos": [-15.362, -70.365]}
+}
+
 if __name__ == "__main__":
-    CIUDADES_DE_INTERES = {
-        "Juliaca": {"pos": [-15.498, -70.129]}, "Caracoto": {"pos": [-15.552, -70.081]},
-        "Cabanillas": {"pos": [-15.635, -70.354]}, "Santa Lucia": {"pos": [-15.698, -70.575]},
-        "Cabana": {"pos": [-15.333, -70.320]}, "Pusi": {"pos": [-15.367, -69.951]},
-        "Samán": {"pos": [-15.311, -70.065]}, "Lampa": {"pos": [-15.362, -70.365]}
-    }
-    root = tk.Tk()
-    app = App(root, CIUDADES_DE_INTERES)
-    root.mainloop()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Sistema de Navegación - San Román")
+    parser.add_argument("--matriz", metavar="ARCHIVO", help="calcula todas las rutas entre ciudades y las guarda en .csv o .json")
+    parser.add_argument("--rutas", action="store_true", help="incluye la lista de nodos de cada ruta en la matriz")
+    parser.add_argument("--procesos", type=int, default=os.cpu_count(), help="procesos para repartir los orígenes")
+    parser.add_argument("--peso", choices=PESOS_DE_RUTA, default='length', help="ruta más corta (length) o más rápida (travel_time)")
+    parser.add_argument("--preparar-motor", action="store_true", help="preprocesa el motor de rutas ALT y lo guarda junto al grafo")
+    parser.add_argument("--ruta", nargs=2, metavar=("ORIGEN", "DESTINO"), help="calcula una ruta sin interfaz y la imprime en JSON")
+    parser.add_argument("--recorrido", nargs="+", metavar="CIUDAD", help="visita varias ciudades en el mejor orden (la primera es la salida) y lo imprime en JSON")
+    parser.add_argument("--regresar", action="store_true", help="con --recorrido, vuelve a la primera ciudad al final")
+    parser.add_argument("--fijar-destino", action="store_true", help="con --recorrido, la última ciudad se visita al final")
+    parser.add_argument("--geometria", metavar="ARCHIVO", help="con --ruta o --recorrido, guarda la línea en .geojson o como polyline codificada")
+    parser.add_argument("--mapa", action="store_true", help="con --ruta o --recorrido, genera también el mapa HTML")
+    parser.add_argument("--servidor", action="store_true", help="inicia el servicio HTTP/JSON de rutas")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8000)
+    parser.add_argument("--max-concurrencia", type=int, default=4, help="peticiones atendidas en paralelo por el servidor")
+    parser.add_argument("--cache-disco", metavar="CARPETA", help="guarda también las rutas calculadas en CARPETA/rutas_cache, para reutilizarlas entre ejecuciones")
+    parser.add_argument("--perfilar", metavar="CARPETA", help="guarda un perfil cProfile (.prof) de cada cálculo de ruta")
+    parser.add_argument("--sintetica", type=int, metavar="NODOS", help="usa una red vial sintética de NODOS nodos en lugar de la de OSM")
+    parser.add_argument("--tipo-sintetica", choices=TIPOS_DE_RED_SINTETICA, default='grilla', help="forma de la red sintética")
+    parser.add_argument("--semilla", type=int, default=0, help="semilla de la red sintética")
+    args = parser.parse_args()
+    CACHE_DE_RUTAS.carpeta = args.cache_disco
+
+    almacen = ALMACEN_SAN_ROMAN
+    if args.sintetica:
+        almacen = almacen_sintetico(args.sintetica, args.tipo_sintetica, args.semilla)
+
+    if args.servidor:
+        iniciar_servidor(CIUDADES_DE_INTERES, args.host, args.puerto, args.max_concurrencia, almacen, perfil=args.perfilar)
+    elif args.ruta:
+        resultado = generar_datos_de_ruta(args.ruta[0], args.ruta[1], CIUDADES_DE_INTERES, lambda mensaje: None,
+                                          almacen=almacen, generar_mapa=args.mapa, abrir_navegador=False, peso=args.peso,
+                                          perfil=args.perfilar)
+        if args.geometria and "polyline" in resultado:
+            exportar_geometria(decodificar_polyline(resultado["polyline"]), args.geometria,
+                               {"origen": args.ruta[0], "destino": args.ruta[1], "distancia_km": resultado["distancia_km"]})
+        print(json.dumps(resultado, ensure_ascii=False, indent=2))
+    elif args.recorrido:
+        resultado = generar_datos_de_recorrido(args.recorrido, CIUDADES_DE_INTERES, lambda mensaje: None,
+                                               almacen=almacen, regresar=args.regresar, fijar_destino=args.fijar_destino,
+                                               generar_mapa=args.mapa, abrir_navegador=False, peso=args.peso,
+                                               perfil=args.perfilar)
+        if args.geometria and "polyline" in resultado:
+            exportar_geometria(decodificar_polyline(resultado["polyline"]), args.geometria,
+                               {"orden": resultado["orden"], "distancia_km": resultado["distancia_km"]})
+        print(json.dumps(resultado, ensure_ascii=False, indent=2))
+    elif args.preparar_motor:
+        almacen.preparar_motor(peso=args.peso, status_callback=print)
+        print(f"Motor guardado en {almacen._ruta_motor(args.peso)}")
+    elif args.matriz:
+        matriz = calcular_matriz_de_rutas(CIUDADES_DE_INTERES, almacen, incluir_rutas=args.rutas, procesos=args.procesos, peso=args.peso)
+        print(f"Matriz guardada en {exportar_matriz(matriz, args.matriz)}")
+    else:
+        lanzar_interfaz(CIUDADES_DE_INTERES, perfil=args.perfilar, almacen=almacen)
\ No newline at end of file
@@ -0,0 +1,48 @@
+import sys
+from itertools import islice, chain
+
+# --- Listados por páginas, escritos en bloques ---
+TAMANO_DE_PAGINA = 20
+FILAS_POR_ESCRITURA = 512
+
+def paginar(iterable, desde=0, cantidad=None):
+    """
+    Generador con los elementos [desde, desde + cantidad) de 'iterable'
+    (cantidad=None: hasta el final). No recorre nada más allá de la página.
+    """
+    return islice(iterable, desde, None if cantidad is None else desde + cantidad)
+
+def escribir_filas(filas, salida=None, filas_por_escritura=FILAS_POR_ESCRITURA):
+    """
+    Escribe las filas (textos terminados en salto de línea) juntando muchas
+    en una sola llamada a write(), en vez de un print() por fila.
+    Devuelve la cantidad de filas escritas.
+    """
+    salida = salida or sys.stdout
+    filas = iter(filas)
+    total = 0
+    while True:
+        bloque = list(islice(filas, filas_por_escritura))
+        if not bloque:
+            break
+        salida.write("".join(bloque))
+        total += len(bloque)
+    salida.flush()
+    return total
+
+def escribir_por_paginas(filas, tamano=TAMANO_DE_PAGINA, preguntar=None, salida=None):
+    """
+    Escribe las filas de a una página y pregunta antes de seguir; solo se
+    generan las filas que se llegan a mostrar. Devuelve cuántas se mostraron.
+    """
+    preguntar = preguntar or input
+    filas = iter(filas)
+    mostradas = 0
+    while True:
+        mostradas += escribir_filas(islice(filas, tamano), salida)
+        siguiente = next(filas, None)
+        if siguiente is None:
+            return mostradas
+        if preguntar(f"-- {mostradas} filas mostradas. Enter: siguiente página, 'q': terminar -- ").strip().lower() == 'q':
+            return mostradas
+        filas = chain((siguiente,), filas)
@@ -0,0 +1,335 @@
+import os
+import sys
+import json
+import math
+import time
+import random
+import shutil
+import platform
+import argparse
+import tempfile
+import importlib
+import statistics
+import tracemalloc
+import networkx as nx
+
+# Los ejercicios tienen nombres que empiezan con un número: se importan por nombre
+CARPETA = os.path.dirname(os.path.abspath(__file__))
+if CARPETA not in sys.path:
+    sys.path.insert(0, CARPETA)
+
+# --- Utilidades de medición ---
+def _por_segundo(operaciones, segundos):
+    return round(operaciones / segundos) if segundos else 0
+
+def _resumen_ms(duraciones):
+    """Mediana, p95 y máximo (en ms) de una lista de duraciones en segundos."""
+    ordenadas = sorted(duraciones)
+    p95 = ordenadas[min(len(ordenadas) - 1, math.ceil(0.95 * len(ordenadas)) - 1)]
+    return {
+        "mediana_ms": round(statistics.median(ordenadas) * 1000, 3),
+        "p95_ms": round(p95 * 1000, 3),
+        "max_ms": round(ordenadas[-1] * 1000, 3),
+    }
+
+def _cronometrar(funcion):
+    inicio = time.perf_counter()
+    resultado = funcion()
+    return time.perf_counter() - inicio, resultado
+
+def _mejor_de(medir, repeticiones):
+    """
+    Repite una medición y se queda, métrica por métrica, con el mejor valor
+    (más operaciones/seg, menos tiempo o memoria): es lo menos afectado por el
+    ruido de otros procesos y lo que permite comparar corridas.
+    """
+    mediciones = [medir() for _ in range(repeticiones)]
+
+    def combinar_metrica(clave, valores):
+        if isinstance(valores[0], dict):
+            return {k: combinar_metrica(k, [v[k] for v in valores]) for k in valores[0]}
+        if isinstance(valores[0], (int, float)) and not isinstance(valores[0], bool):
+            return max(valores) if clave.endswith("_por_segundo") else min(valores)
+        return valores[0]
+
+    return {clave: combinar_metrica(clave, [m[clave] for m in mediciones]) for clave in mediciones[0]}
+
+def _memoria_de(construir):
+    """Bytes que quedan ocupados después de construir la estructura (tracemalloc)."""
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        estructura = construir()
+        return tracemalloc.get_traced_memory()[0] - base, estructura
+    finally:
+        tracemalloc.stop()
+
+# --- GestorDeTareas (4heap.py) ---
+def medir_gestor_de_tareas(n, semilla=0):
+    """
+    Operaciones/seg del heap indexado con n tareas: insertar, cambiar prioridad,
+    consultar las 10 primeras, atender y carga masiva (heapify); y bytes por tarea.
+    Se usan los métodos internos que no imprimen, para medir solo la estructura.
+    """
+    heap = importlib.import_module("4heap")
+    azar = random.Random(semilla)
+    descripciones = [f"Tarea {i}" for i in range(n)]
+    prioridades = [azar.randint(1, 10) for _ in range(n)]
+
+    def llenar():
+        gestor = heap.GestorDeTareas()
+        for descripcion, prioridad in zip(descripciones, prioridades):
+            gestor._insertar(descripcion, prioridad)
+        return gestor
+
+    memoria, _ = _memoria_de(llenar)
+    segundos, gestor = _cronometrar(llenar)
+    resultado = {"n": n, "bytes_por_tarea": round(memoria / n, 1), "insertar_por_segundo": _por_segundo(n, segundos)}
+
+    cambios = min(n, 20_000)
+    ids = [azar.randint(1, n) for _ in range(cambios)]
+    segundos, _ = _cronometrar(lambda: [gestor._reubicar(i, azar.randint(1, 10)) for i in ids])
+    resultado["cambiar_prioridad_por_segundo"] = _por_segundo(cambios, segundos)
+
+    consultas = 2_000
+    segundos, _ = _cronometrar(lambda: [gestor.tareas_principales(10) for _ in range(consultas)])
+    resultado["top10_por_segundo"] = _por_segundo(consultas, segundos)
+
+    segundos, _ = _cronometrar(lambda: [gestor._quitar_en(0) for _ in range(n)])
+    resultado["atender_por_segundo"] = _por_segundo(n, segundos)
+
+    lote = [(prioridad, None, descripcion) for descripcion, prioridad in zip(descripciones, prioridades)]
+    segundos, _ = _cronometrar(lambda: heap.GestorDeTareas()._cargar_validadas(lote))
+    resultado["carga_masiva_por_segundo"] = _por_segundo(n, segundos)
+    return resultado
+
+# --- ColaDeEspera (3gestionDePacientes.py) ---
+def medir_cola_de_espera(n, modo='fifo', semilla=0):
+    """
+    Operaciones/seg de la cola de pacientes con n pacientes: encolar, buscar por
+    nombre, retirar del medio, atender y la primera página del listado; y bytes
+    por paciente.
+    """
+    pacientes = importlib.import_module("3gestionDePacientes")
+    azar = random.Random(semilla)
+    nombres = [f"Paciente {i}" for i in range(n)]
+    niveles = ("normal", "urgente")
+
+    def llenar():
+        cola = pacientes.ColaDeEspera(modo=modo)
+        for i, nombre in enumerate(nombres):
+            cola._encolar(nombre, i % 90, niveles[i % 7 == 0])
+        return cola
+
+    memoria, _ = _memoria_de(llenar)
+    segundos, cola = _cronometrar(llenar)
+    resultado = {"n": n, "modo": modo, "bytes_por_paciente": round(memoria / n, 1),
+                 "encolar_por_segundo": _por_segundo(n, segundos)}
+
+    consultas = min(n, 20_000)
+    buscados = [nombres[azar.randrange(n)] for _ in range(consultas)]
+    segundos, _ = _cronometrar(lambda: [cola.buscar_paciente(nombre) for nombre in buscados])
+    resultado["buscar_por_segundo"] = _por_segundo(consultas, segundos)
+
+    paginas = 2_000
+    segundos, _ = _cronometrar(lambda: [cola.proximos_pacientes(20) for _ in range(paginas)])
+    resultado["primera_pagina_por_segundo"] = _por_segundo(paginas, segundos)
+
+    retirados = min(n // 2, 20_000)
+    ids = azar.sample(range(1, n + 1), retirados)
+    segundos, _ = _cronometrar(lambda: [cola._quitar(i) for i in ids])
+    resultado["retirar_por_segundo"] = _por_segundo(retirados, segundos)
+
+    restantes = cola.contador
+    segundos, _ = _cronometrar(lambda: [cola._desencolar() for _ in range(restantes)])
+    resultado["atender_por_segundo"] = _por_segundo(restantes, segundos)
+    return resultado
+
+# --- Fases de generar_datos_de_ruta (5Grafos.py) ---
+def medir_fases_de_ruta(nodos, tipo='grilla', repeticiones=3, semilla=0):
+    """
+    Mide por separado cada fase del cálculo de una ruta sobre una red sintética
+    (generar_red_sintetica de 5Grafos.py) de 'nodos' nodos, para todos los pares
+    de CIUDADES_DE_INTERES: generación de la red y memoria que ocupa, carga
+    del grafo (construcción + pickle, y lectura del pickle), ubicación de
+    las ciudades en el grafo, Dijkstra, post-proceso (resumen y geometría) y
+    dibujo del mapa; además, generar_datos_de_ruta completo con y sin cache.
+    Todo se escribe en una carpeta temporal que se borra al terminar.
+    """
+    grafos = importlib.import_module("5Grafos")
+    ciudades = grafos.CIUDADES_DE_INTERES
+    pares = [(o, d) for o in ciudades for d in ciudades if o != d]
+    segundos, G = _cronometrar(lambda: grafos.generar_red_sintetica(nodos, tipo, semilla))
+    memoria, _ = _memoria_de(lambda: grafos.generar_red_sintetica(nodos, tipo, semilla))
+    resultado = {"nodos": G.number_of_nodes(), "tipo": tipo, "aristas": G.number_of_edges(), "pares": len(pares),
+                 "generar_red_ms": round(segundos * 1000, 3), "bytes_por_nodo": round(memoria / nodos, 1)}
+
+    carpeta = tempfile.mkdtemp(prefix="mediciones_")
+    directorio_anterior = os.getcwd()
+    os.chdir(carpeta)  # Los mapas HTML se guardan en el directorio actual
+    try:
+        ruta_archivo = os.path.join(carpeta, "grafo.pkl")
+        segundos, _ = _cronometrar(lambda: grafos.AlmacenDeGrafo("sintetico", ruta_archivo=ruta_archivo,
+                                                                  constructor=lambda: G).obtener())
+        resultado["carga_construccion_ms"] = round(segundos * 1000, 3)
+        almacen = grafos.AlmacenDeGrafo("sintetico", ruta_archivo=ruta_archivo, constructor=lambda: G)
+        segundos, G = _cronometrar(almacen.obtener)
+        resultado["carga_disco_ms"] = round(segundos * 1000, 3)
+
+        segundos, indice = _cronometrar(almacen.obtener_indice)
+        resultado["indice_espacial_ms"] = round(segundos * 1000, 3)
+        segundos, tabla = _cronometrar(almacen.obtener_tabla)
+        resultado["tabla_de_aristas_ms"] = round(segundos * 1000, 3)
+
+        nodo_de = dict(zip(ciudades, indice.nodos_mas_cercanos([c['pos'] for c in ciudades.values()])))
+        ubicar, dijkstra, procesar, dibujar = [], [], [], []
+        for _ in range(repeticiones):
+            for origen, destino in pares:
+                segundos, _ = _cronometrar(lambda: indice.nodos_mas_cercanos([ciudades[origen]['pos'], ciudades[destino]['pos']]))
+                ubicar.append(segundos)
+                segundos, ruta = _cronometrar(lambda: nx.shortest_path(G, nodo_de[origen], nodo_de[destino], weight='length'))
+                dijkstra.append(segundos)
+
+                def post_proceso():
+                    tabla.resumir_ruta(ruta)
+                    puntos = [(G.nodes[nodo]['y'], G.nodes[nodo]['x']) for nodo in ruta]
+                    geometria = grafos.simplificar_linea(puntos, grafos.tolerancia_para_zoom(16, puntos[0][0]))
+                    grafos.codificar_polyline(geometria)
+                    return geometria
+                segundos, geometria = _cronometrar(post_proceso)
+                procesar.append(segundos)
+        # Dibujar el mapa es lento: una vez por par
+        for origen, destino in pares:
+            ruta = nx.shortest_path(G, nodo_de[origen], nodo_de[destino], weight='length')
+            puntos = [(G.nodes[nodo]['y'], G.nodes[nodo]['x']) for nodo in ruta]
+            segundos, _ = _cronometrar(lambda: grafos.dibujar_mapa(puntos, origen, destino, ciudades))
+            dibujar.append(segundos)
+        resultado["ubicar_ciudades"] = _resumen_ms(ubicar)
+        resultado["dijkstra"] = _resumen_ms(dijkstra)
+        resultado["post_proceso"] = _resumen_ms(procesar)
+        resultado["dibujar_mapa"] = _resumen_ms(dibujar)
+
+        completo, con_cache = [], []
+        cache = grafos.CacheDeRutas(capacidad=len(pares))
+        for origen, destino in pares:
+            segundos, _ = _cronometrar(lambda: grafos.generar_datos_de_ruta(
+                origen, destino, ciudades, lambda mensaje: None, almacen=almacen,
+                generar_mapa=False, abrir_navegador=False, cache=cache))
+            completo.append(segundos)
+            segundos, _ = _cronometrar(lambda: grafos.generar_datos_de_ruta(
+                origen, destino, ciudades, lambda mensaje: None, almacen=almacen,
+                generar_mapa=False, abrir_navegador=False, cache=cache))
+            con_cache.append(segundos)
+        resultado["generar_datos_de_ruta"] = _resumen_ms(completo)
+        resultado["generar_datos_de_ruta_cache"] = _resumen_ms(con_cache)
+    finally:
+        os.chdir(directorio_anterior)
+        shutil.rmtree(carpeta, ignore_errors=True)
+    return resultado
+
+# --- Ejecución completa y comparación entre corridas ---
+def ejecutar_mediciones(tamanos=(1_000, 10_000, 100_000), nodos=(1_000, 10_000), partes=("tareas", "colas", "rutas"),
+                        semilla=0, repeticiones=3, tipo_red='grilla', informar=print):
+    """Corre las mediciones pedidas (cada una 'repeticiones' veces) y devuelve un dict serializable en JSON."""
+    resultados = {
+        "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "semilla": semilla,
+        "repeticiones": repeticiones,
+    }
+    if "tareas" in partes:
+        resultados["tareas"] = []
+        for n in tamanos:
+            informar(f"GestorDeTareas con {n} tareas...")
+            resultados["tareas"].append(_mejor_de(lambda: medir_gestor_de_tareas(n, semilla), repeticiones))
+    if "colas" in partes:
+        resultados["colas"] = []
+        for modo in ("fifo", "triaje"):
+            for n in tamanos:
+                informar(f"ColaDeEspera ({modo}) con {n} pacientes...")
+                resultados["colas"].append(_mejor_de(lambda: medir_cola_de_espera(n, modo, semilla), repeticiones))
+    if "rutas" in partes:
+        resultados["rutas"] = []
+        for cantidad in nodos:
+            informar(f"Rutas en una red sintética ({tipo_red}) de {cantidad} nodos...")
+            resultados["rutas"].append(_mejor_de(lambda: medir_fases_de_ruta(cantidad, tipo_red, semilla=semilla), repeticiones))
+    return resultados
+
+def _aplanar(datos, prefijo=""):
+    """{'colas': [{'n': 10, 'x': 1}]} -> {'colas[n=10].x': 1}: claves estables entre corridas."""
+    planos = {}
+    if isinstance(datos, dict):
+        for clave, valor in datos.items():
+            planos.update(_aplanar(valor, f"{prefijo}.{clave}" if prefijo else clave))
+    elif isinstance(datos, list):
+        for posicion, valor in enumerate(datos):
+            etiqueta = posicion
+            if isinstance(valor, dict):
+                etiqueta = ",".join(f"{k}={valor[k]}" for k in ("n", "modo", "nodos", "tipo") if k in valor) or posicion
+            planos.update(_aplanar(valor, f"{prefijo}[{etiqueta}]"))
+    elif isinstance(datos, (int, float)) and not isinstance(datos, bool):
+        planos[prefijo] = datos
+    return planos
+
+def comparar_mediciones(anterior, actual, tolerancia=0.10):
+    """
+    Devuelve [(métrica, antes, ahora, cambio relativo, es_regresion)] de las métricas
+    que cambiaron más que 'tolerancia'. En '..._por_segundo' más es mejor; en
+    tiempos (_ms) y memoria (bytes_) menos es mejor.
+    """
+    antes, ahora = _aplanar(anterior), _aplanar(actual)
+    cambios = []
+    for metrica in sorted(antes.keys() & ahora.keys()):
+        nombre = metrica.rsplit(".", 1)[-1]
+        mas_es_mejor = nombre.endswith("_por_segundo")
+        if not (mas_es_mejor or nombre.endswith("_ms") or nombre.startswith("bytes_")):
+            continue
+        if not antes[metrica]:
+            continue
+        cambio = (ahora[metrica] - antes[metrica]) / antes[metrica]
+        if abs(cambio) > tolerancia:
+            cambios.append((metrica, antes[metrica], ahora[metrica], cambio, (cambio < 0) == mas_es_mejor))
+    return cambios
+
+def mostrar_comparacion(cambios):
+    print("\n" + "="*90)
+    print("  CAMBIOS RESPECTO DE LA CORRIDA ANTERIOR")
+    print("="*90)
+    if not cambios:
+        print("Sin cambios por encima de la tolerancia.")
+    for metrica, antes, ahora, cambio, es_regresion in cambios:
+        marca = "REGRESIÓN" if es_regresion else "mejora"
+        print(f"{metrica:<55}{antes:>10}{ahora:>12}{cambio:>+9.0%}  {marca}")
+    print("="*90)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mediciones de rendimiento de las colas, el heap y el cálculo de rutas")
+    parser.add_argument("--tamanos", type=int, nargs='+', default=[1_000, 10_000, 100_000], help="cantidades de tareas/pacientes")
+    parser.add_argument("--nodos", type=int, nargs='+', default=[1_000, 10_000], help="tamaños de las redes viales sintéticas")
+    parser.add_argument("--tipo-red", choices=("grilla", "geometrica"), default='grilla', help="forma de la red sintética")
+    parser.add_argument("--solo", choices=("tareas", "colas", "rutas"), nargs='+', help="mide solo esas partes")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--repeticiones", type=int, default=3, help="se guarda el mejor valor de cada métrica")
+    parser.add_argument("--tolerancia", type=float, default=0.10, help="cambio relativo que se informa al comparar")
+    parser.add_argument("--salida", metavar="ARCHIVO", help="JSON de resultados (por defecto, en resultados_mediciones/)")
+    parser.add_argument("--comparar", metavar="ARCHIVO", help="JSON de una corrida anterior para detectar regresiones")
+    args = parser.parse_args()
+
+    resultados = ejecutar_mediciones(args.tamanos, args.nodos, args.solo or ("tareas", "colas", "rutas"),
+                                     args.semilla, args.repeticiones, args.tipo_red)
+    salida = args.salida or os.path.join("resultados_mediciones", f"mediciones_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    if os.path.dirname(salida):
+        os.makedirs(os.path.dirname(salida), exist_ok=True)
+    with open(salida, 'w', encoding='utf-8') as archivo:
+        json.dump(resultados, archivo, ensure_ascii=False, indent=2)
+    print(json.dumps(resultados, ensure_ascii=False, indent=2))
+    print(f"\nResultados guardados en {salida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as archivo:
+            anterior = json.load(archivo)
+        cambios = comparar_mediciones(anterior, resultados, args.tolerancia)
+        mostrar_comparacion(cambios)
+        if any(es_regresion for *_, es_regresion in cambios):
+            sys.exit(1)
@@ -0,0 +1,300 @@
+import os
+import json
+import time
+import shutil
+import tempfile
+import threading
+from itertools import islice
+
+# --- Bitácora de escritura anticipada (WAL) con snapshots ---
+POLITICAS_FSYNC = ('siempre', 'lote', 'nunca')
+ELEMENTOS_POR_BLOQUE = 2_000  # Elementos de una lista que se serializan de una vez al escribir un snapshot
+
+def _escribir_json_por_bloques(archivo, valor):
+    """
+    Escribe 'valor' en JSON como json.dump, pero las listas se serializan de a
+    ELEMENTOS_POR_BLOQUE elementos: cada llamada al codificador (en C) es corta
+    y un hilo en segundo plano no retiene el GIL durante todo el snapshot.
+    Un generador se escribe como lista, consumiéndolo de a bloques: las filas
+    se crean y se liberan por bloque, sin armar la lista completa en memoria.
+    """
+    if isinstance(valor, dict):
+        archivo.write("{")
+        for numero, (clave, elemento) in enumerate(valor.items()):
+            archivo.write((", " if numero else "") + json.dumps(str(clave), ensure_ascii=False) + ": ")
+            _escribir_json_por_bloques(archivo, elemento)
+        archivo.write("}")
+    elif isinstance(valor, list) or hasattr(valor, '__next__'):
+        elementos = iter(valor)
+        archivo.write("[")
+        separador = ""
+        while True:
+            bloque = list(islice(elementos, ELEMENTOS_POR_BLOQUE))
+            if not bloque:
+                break
+            archivo.write(separador + json.dumps(bloque, ensure_ascii=False)[1:-1])
+            separador = ", "
+        archivo.write("]")
+    else:
+        archivo.write(json.dumps(valor, ensure_ascii=False))
+
+class BitacoraDeEscritura:
+    """
+    Guarda cada operación en un archivo de solo-agregar (una línea JSON por
+    operación) y, cada cierto número de operaciones, un snapshot compacto del
+    estado completo. Al reiniciar se carga el snapshot y se repiten solo las
+    operaciones registradas después de él.
+
+    El snapshot no frena a quien registra: la bitácora se rota (las
+    operaciones siguientes van a un archivo nuevo) y el estado se escribe en
+    un hilo aparte. Mientras tanto la bitácora anterior se conserva, así que
+    una caída a mitad del snapshot se recupera con el snapshot previo y las
+    dos bitácoras.
+
+    Políticas de fsync:
+      - 'siempre': cada operación se fuerza a disco antes de volver (lo más seguro y lento).
+      - 'lote':    un hilo en segundo plano hace fsync cada 'intervalo_lote' segundos
+                   (group commit); registrar() no espera al disco.
+      - 'nunca':   se deja la escritura al sistema operativo.
+    """
+    def __init__(self, carpeta, politica='lote', intervalo_lote=0.01, operaciones_por_snapshot=10_000):
+        if politica not in POLITICAS_FSYNC:
+            raise ValueError(f"Política de fsync desconocida: {politica}. Use una de {', '.join(POLITICAS_FSYNC)}.")
+        self.carpeta = carpeta
+        self.politica = politica
+        self.intervalo_lote = intervalo_lote
+        self.operaciones_por_snapshot = operaciones_por_snapshot
+        self.ruta_bitacora = os.path.join(carpeta, "bitacora.jsonl")
+        self.ruta_bitacora_anterior = os.path.join(carpeta, "bitacora.anterior.jsonl")
+        self.ruta_snapshot = os.path.join(carpeta, "snapshot.json")
+        os.makedirs(carpeta, exist_ok=True)
+
+        self._candado = threading.Lock()
+        self._pendiente_fsync = False
+        self._detener = threading.Event()
+        self.secuencia = 0  # Número de la última operación registrada
+        self.desde_snapshot = 0  # Operaciones registradas desde el último snapshot
+        self._hilo_snapshot = None
+        self._snapshot_en_curso = False  # Desde la rotación hasta que el snapshot queda escrito
+        self.error_snapshot = None  # Último error del hilo de snapshots (la bitácora anterior se conserva)
+
+        # Se lee una sola vez lo guardado: los dueños lo toman con recuperado()
+        self._recuperado = self.recuperar()
+        snapshot, operaciones = self._recuperado
+        # Se averigua la última secuencia para seguir numerando después de ella
+        if operaciones:
+            self.secuencia = operaciones[-1][0]
+        elif snapshot is not None:
+            self.secuencia = snapshot[0]
+        self.desde_snapshot = len(operaciones)
+        # Si quedó una línea a medias se corta, para no escribir a continuación de ella
+        if os.path.exists(self.ruta_bitacora) and os.path.getsize(self.ruta_bitacora) > self._bytes_validos:
+            with open(self.ruta_bitacora, 'r+b') as archivo:
+                archivo.truncate(self._bytes_validos)
+        if os.path.exists(self.ruta_bitacora_anterior):
+            self._juntar_bitacoras()
+
+        self._archivo = open(self.ruta_bitacora, 'a', encoding='utf-8')
+        self._hilo = None
+        if politica == 'lote':
+            self._hilo = threading.Thread(target=self._fsync_periodico, name="bitacora-fsync", daemon=True)
+            self._hilo.start()
+
+    def recuperado(self):
+        """
+        Devuelve (snapshot, operaciones) tal como se leyeron al abrir la
+        bitácora, sin volver a leer el disco. Solo se entrega una vez.
+        """
+        recuperado, self._recuperado = self._recuperado, None
+        return recuperado
+
+    def _juntar_bitacoras(self):
+        """
+        Una caída durante un snapshot dejó dos bitácoras: se unen en una sola
+        (primero la anterior) para que la próxima rotación no pise operaciones
+        que todavía no están en ningún snapshot.
+        """
+        temporal = self.ruta_bitacora + ".tmp"
+        with open(temporal, 'wb') as destino:
+            for ruta in (self.ruta_bitacora_anterior, self.ruta_bitacora):
+                if os.path.exists(ruta):
+                    with open(ruta, 'rb') as origen:
+                        shutil.copyfileobj(origen, destino)
+            destino.flush()
+            os.fsync(destino.fileno())
+        os.replace(temporal, self.ruta_bitacora)
+        os.remove(self.ruta_bitacora_anterior)
+
+    def _fsync_periodico(self):
+        while not self._detener.wait(self.intervalo_lote):
+            self._forzar_a_disco()
+
+    def _forzar_a_disco(self):
+        with self._candado:
+            if not self._pendiente_fsync or self._archivo.closed:
+                return
+            self._archivo.flush()
+            # Se duplica el descriptor: un snapshot puede cerrar el archivo mientras tanto
+            descriptor = os.dup(self._archivo.fileno())
+            self._pendiente_fsync = False
+        # El fsync se hace fuera del candado para no frenar a quienes registran
+        try:
+            os.fsync(descriptor)
+        finally:
+            os.close(descriptor)
+
+    def registrar(self, operacion):
+        """Agrega una operación (lista serializable en JSON) a la bitácora."""
+        with self._candado:
+            self.secuencia += 1
+            self.desde_snapshot += 1
+            self._archivo.write(json.dumps([self.secuencia, operacion], ensure_ascii=False) + "\n")
+            if self.politica == 'siempre':
+                self._archivo.flush()
+                os.fsync(self._archivo.fileno())
+            elif self.politica == 'lote':
+                self._pendiente_fsync = True
+            else:
+                self._archivo.flush()
+
+    def necesita_snapshot(self, tamano_estado=0):
+        """
+        True si conviene un snapshot: pasaron al menos 'operaciones_por_snapshot'
+        operaciones y al menos una por cada cuatro elementos del estado (así
+        escribir el estado completo cuesta O(1) amortizado por operación y la
+        bitácora a repetir al recuperar no pasa de un cuarto del estado), y no
+        hay otro snapshot en curso (ni uno que falló: su bitácora anterior
+        todavía hace falta).
+        """
+        return (self.desde_snapshot >= max(self.operaciones_por_snapshot, tamano_estado // 4)
+                and not self._snapshot_en_curso)
+
+    def programar_snapshot(self, armar_estado):
+        """
+        Rota la bitácora y escribe el snapshot en un hilo aparte. El dueño
+        debe llamarla justo después de registrar la última operación que el
+        snapshot cubre, con una copia barata de su estado ya tomada:
+        armar_estado() se ejecuta en el hilo del snapshot y devuelve el estado
+        serializable. Devuelve el hilo (para esperarlo, si hace falta).
+        """
+        with self._candado:
+            secuencia = self.secuencia
+            self._archivo.close()
+            os.replace(self.ruta_bitacora, self.ruta_bitacora_anterior)
+            self._archivo = open(self.ruta_bitacora, 'w', encoding='utf-8')
+            self._pendiente_fsync = False
+            self.desde_snapshot = 0
+            self._snapshot_en_curso = True
+            self._hilo_snapshot = threading.Thread(target=self._escribir_snapshot, args=(secuencia, armar_estado),
+                                                   name="bitacora-snapshot", daemon=True)
+            self._hilo_snapshot.start()
+        return self._hilo_snapshot
+
+    def _escribir_snapshot(self, secuencia, armar_estado):
+        """
+        Escribe el snapshot (que cubre hasta 'secuencia') y recién entonces
+        borra la bitácora anterior. Si algo falla, la bitácora anterior queda
+        y la recuperación la sigue usando.
+        """
+        try:
+            if self.politica != 'nunca':
+                with open(self.ruta_bitacora_anterior, 'rb') as anterior:
+                    os.fsync(anterior.fileno())
+            temporal = self.ruta_snapshot + ".tmp"
+            with open(temporal, 'w', encoding='utf-8') as archivo:
+                _escribir_json_por_bloques(archivo, {"secuencia": secuencia, "estado": armar_estado()})
+                archivo.flush()
+                os.fsync(archivo.fileno())
+            os.replace(temporal, self.ruta_snapshot)
+            os.remove(self.ruta_bitacora_anterior)
+            self._snapshot_en_curso = False
+        except Exception as e:
+            self.error_snapshot = e
+
+    def esperar_snapshot(self):
+        """Espera a que termine el snapshot en curso, si hay uno."""
+        hilo = self._hilo_snapshot
+        if hilo is not None:
+            hilo.join()
+
+    def recuperar(self):
+        """
+        Devuelve ((secuencia, estado) del snapshot o None, [(secuencia, operacion), ...]).
+        Una última línea incompleta (caída a mitad de escritura) se descarta.
+        """
+        snapshot = None
+        if os.path.exists(self.ruta_snapshot):
+            with open(self.ruta_snapshot, encoding='utf-8') as archivo:
+                datos = json.load(archivo)
+            snapshot = (datos["secuencia"], datos["estado"])
+        desde = snapshot[0] if snapshot else 0
+
+        operaciones = []
+        # La bitácora anterior solo existe si hubo una caída durante un snapshot
+        for ruta in (self.ruta_bitacora_anterior, self.ruta_bitacora):
+            self._bytes_validos = 0
+            if not os.path.exists(ruta):
+                continue
+            with open(ruta, 'rb') as archivo:
+                for linea in archivo:
+                    if not linea.endswith(b"\n"):
+                        break
+                    try:
+                        secuencia, operacion = json.loads(linea)
+                    except ValueError:
+                        break
+                    self._bytes_validos += len(linea)
+                    if secuencia > desde:
+                        operaciones.append((secuencia, operacion))
+        return snapshot, operaciones
+
+    def cerrar(self):
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join()
+        self.esperar_snapshot()
+        with self._candado:
+            if not self._archivo.closed:
+                self._archivo.flush()
+                if self.politica != 'nunca':
+                    os.fsync(self._archivo.fileno())
+                self._archivo.close()
+
+# --- Medición de rendimiento por política de fsync ---
+def medir_politicas_fsync(crear_estructura, operar, operaciones=5_000, politicas=POLITICAS_FSYNC):
+    """
+    Mide operaciones/seg con cada política de fsync (y sin persistencia).
+    crear_estructura(carpeta, politica) crea la estructura durable (carpeta=None: sin bitácora)
+    y operar(estructura, i) ejecuta una operación.
+    Devuelve {politica: {"ops_por_segundo", "recuperacion_ms"}}.
+    """
+    resultados = {}
+    for politica in (None,) + tuple(politicas):
+        carpeta = tempfile.mkdtemp(prefix="bitacora_") if politica else None
+        try:
+            estructura = crear_estructura(carpeta, politica)
+            inicio = time.perf_counter()
+            for i in range(operaciones):
+                operar(estructura, i)
+            duracion = time.perf_counter() - inicio
+            medicion = {"ops_por_segundo": round(operaciones / duracion) if duracion else 0}
+            if politica:
+                estructura.cerrar_persistencia()
+                inicio = time.perf_counter()
+                crear_estructura(carpeta, politica).cerrar_persistencia()
+                medicion["recuperacion_ms"] = round((time.perf_counter() - inicio) * 1000, 2)
+            resultados[politica or "sin persistencia"] = medicion
+        finally:
+            if carpeta:
+                shutil.rmtree(carpeta, ignore_errors=True)
+    return resultados
+
+def mostrar_medicion(titulo, resultados):
+    print("\n" + "="*55)
+    print(f"  {titulo}")
+    print("="*55)
+    print(f"{'Política':<20}{'ops/seg':>12}{'recuperación (ms)':>22}")
+    print("-"*55)
+    for politica, medicion in resultados.items():
+        print(f"{politica:<20}{medicion['ops_por_segundo']:>12}{medicion.get('recuperacion_ms', '-'):>22}")
+    print("="*55)